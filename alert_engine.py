@@ -0,0 +1,197 @@
+"""Stateful threshold alerting: one alert per incident instead of one per reading.
+
+An incident opens for a node and metric when a reading crosses a threshold,
+and stays open while readings remain beyond that threshold minus a hysteresis
+margin, so a value hovering around a threshold does not flap. It is reported
+as a single alert ("ongoing since X, peak Y, N readings") updated in place:
+
+* the alert is re-published (with a new seq) when the incident escalates to
+  critical, when it ends, and at most every ALERT_UPDATE_INTERVAL seconds in
+  between; other readings only update its counters;
+* an incident starting within ALERT_COOLDOWN seconds of the end of the
+  previous one for the same node and metric reopens the previous alert.
+
+Escalation and reopening mark the alert unread again. Deleting the alert of
+an incident drops the incident: a later reading out of range opens a new one.
+
+Alert volume thus follows incidents, not the sample rate. Durations use the
+readings' own timestamps, or their arrival time when unparseable.
+"""
+from datetime import datetime
+import threading
+
+import numpy as np
+
+from config import Config
+from timestamps import to_datetime64
+import thresholds
+
+METRICS = (
+    # name, condition labels, unit
+    ('temperature', thresholds.TEMPERATURE_LABELS, '°C'),
+    ('humidity', thresholds.HUMIDITY_LABELS, '%'),
+)
+
+LOW_CODES = (thresholds.LOW, thresholds.CRITICAL_LOW)
+CRITICAL_CODES = (thresholds.CRITICAL_LOW, thresholds.CRITICAL_HIGH)
+
+
+def is_low(code):
+    return code in LOW_CODES
+
+
+class Incident:
+    """One node and metric out of range, and the alert reporting it"""
+    __slots__ = ('alert_id', 'metric', 'code', 'since', 'peak', 'count', 'last_seconds',
+                 'published_seconds', 'ended', 'ended_seconds')
+
+    def __init__(self, metric, code, value, timestamp, seconds):
+        self.alert_id = None
+        self.metric = metric
+        self.code = code                  # Worst condition seen
+        self.since = timestamp
+        self.peak = value                 # Furthest value from the normal range
+        self.count = 0
+        self.last_seconds = seconds
+        self.published_seconds = seconds
+        self.ended = None                 # Timestamp of the first reading back in range
+        self.ended_seconds = None
+
+    @property
+    def ongoing(self):
+        return self.ended is None
+
+    def add(self, code, value, seconds):
+        """Count a reading still out of range, returns True if the incident escalated"""
+        self.count += 1
+        self.peak = min(self.peak, value) if is_low(self.code) else max(self.peak, value)
+        self.last_seconds = seconds
+        escalated = code in CRITICAL_CODES and self.code not in CRITICAL_CODES
+        if escalated:
+            self.code = code
+        return escalated
+
+
+class AlertEngine:
+    """Turns batches of readings into incident alerts kept in a store.
+
+    The store provides add_alert(node_id, message, severity, timestamp,
+    metric, **details) returning the new alert id, and update_alert(alert_id,
+    publish, **fields), which gives the alert a new seq when publish is set
+    and returns False when the alert no longer exists.
+    """
+    def __init__(self, store, temperature_margin=None, humidity_margin=None,
+                 cooldown=None, update_interval=None):
+        self.store = store
+        self.margins = {
+            'temperature': Config.TEMP_HYSTERESIS if temperature_margin is None else temperature_margin,
+            'humidity': Config.HUMIDITY_HYSTERESIS if humidity_margin is None else humidity_margin,
+        }
+        self.cooldown = Config.ALERT_COOLDOWN if cooldown is None else cooldown
+        self.update_interval = Config.ALERT_UPDATE_INTERVAL if update_interval is None else update_interval
+        self.incidents = {}  # (node_id, metric) -> latest Incident, ongoing or in cooldown
+        self.lock = threading.Lock()
+
+    def process(self, node_ids, temperatures, humidities, timestamps):
+        """Feed a batch of readings in arrival order"""
+        temperature_values = np.asarray(temperatures, dtype=float)
+        humidity_values = np.asarray(humidities, dtype=float)
+        strict = thresholds.classify(temperature_values, humidity_values)
+        relaxed = thresholds.classify(temperature_values, humidity_values,
+                                      self.margins['temperature'], self.margins['humidity'])
+        node_array = np.asarray(node_ids)
+
+        with self.lock:
+            # Only readings out of range (hysteresis included) and readings of
+            # nodes that may have an incident to end are visited in Python
+            watched = {node_id for (node_id, _), incident in self.incidents.items() if incident.ongoing}
+            watched.update(node_array[(relaxed[0] != thresholds.NORMAL) | (relaxed[1] != thresholds.NORMAL)].tolist())
+            indices = np.flatnonzero(np.isin(node_array, list(watched))).tolist()
+            if not indices:
+                return
+            times = to_datetime64([timestamps[index] for index in indices])
+            # Same clock as the server's own timestamps (local time)
+            times[np.isnat(times)] = np.datetime64(datetime.now(), 's')
+            seconds = times.astype(np.int64).tolist()
+
+            for index, reading_seconds in zip(indices, seconds):
+                for position, ((metric, labels, unit), values) in enumerate(
+                        zip(METRICS, (temperature_values, humidity_values))):
+                    self.observe(node_ids[index], metric, labels, unit, int(strict[position][index]),
+                                 int(relaxed[position][index]), float(values[index]),
+                                 timestamps[index], reading_seconds)
+
+    def observe(self, node_id, metric, labels, unit, code, relaxed_code, value, timestamp, seconds):
+        """Advance the incident of one node and metric by one reading"""
+        key = (node_id, metric)
+        incident = self.incidents.get(key)
+
+        if incident is not None and incident.ongoing:
+            if relaxed_code != thresholds.NORMAL and is_low(relaxed_code) == is_low(incident.code):
+                escalated = incident.add(code if code != thresholds.NORMAL else incident.code, value, seconds)
+                publish = escalated or seconds - incident.published_seconds >= self.update_interval
+                self.report(node_id, labels, unit, incident, publish, seconds, unread=escalated)
+                return
+            # Back in range by the hysteresis margin
+            incident.ended = timestamp
+            incident.ended_seconds = seconds
+            self.report(node_id, labels, unit, incident, True, seconds)
+
+        if code == thresholds.NORMAL:
+            return
+        if (incident is not None and is_low(code) == is_low(incident.code)
+                and seconds - incident.ended_seconds <= self.cooldown):
+            # Flapping: the previous incident goes on
+            incident.ended = incident.ended_seconds = None
+            incident.add(code, value, seconds)
+            self.report(node_id, labels, unit, incident, True, seconds, unread=True)
+            return
+
+        incident = self.incidents[key] = Incident(metric, code, value, timestamp, seconds)
+        incident.add(code, value, seconds)
+        self.open_alert(node_id, labels, unit, incident)
+
+    def forget_alerts(self, alert_ids):
+        """Drop the incidents of deleted alerts"""
+        alert_ids = set(alert_ids)
+        with self.lock:
+            for key, incident in list(self.incidents.items()):
+                if incident.alert_id in alert_ids:
+                    del self.incidents[key]
+
+    def open_alert(self, node_id, labels, unit, incident):
+        incident.alert_id = self.store.add_alert(
+            node_id, self.describe(node_id, labels, unit, incident), thresholds.SEVERITIES[incident.code],
+            incident.since, incident.metric, **self.details(incident)
+        )
+
+    def report(self, node_id, labels, unit, incident, publish, seconds, unread=False):
+        """Update the incident's alert; unread brings an alert marked read back to the inbox"""
+        if publish:
+            incident.published_seconds = seconds
+        fields = self.details(incident)
+        if unread:
+            fields["read"] = False
+        updated = self.store.update_alert(
+            incident.alert_id, publish,
+            message=self.describe(node_id, labels, unit, incident),
+            severity=thresholds.SEVERITIES[incident.code],
+            **fields
+        )
+        if not updated:
+            # Deleted or pruned from the store meanwhile: report the incident anew
+            self.open_alert(node_id, labels, unit, incident)
+
+    @staticmethod
+    def describe(node_id, labels, unit, incident):
+        if incident.ongoing:
+            period = f"ongoing since {incident.since}"
+        else:
+            period = f"from {incident.since} to {incident.ended}"
+        return (f"Node {node_id}: {labels[incident.code]} {period}, "
+                f"peak {incident.peak}{unit}, {incident.count} reading{'s' if incident.count != 1 else ''}")
+
+    @staticmethod
+    def details(incident):
+        return {"peak": incident.peak, "count": incident.count,
+                "ongoing": incident.ongoing, "ended": incident.ended}
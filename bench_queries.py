@@ -0,0 +1,133 @@
+"""Benchmark sensor_data query latency with and without the time-series indexes.
+
+Usage: python bench_queries.py [--rows 10000000] [--nodes 20] [--repeat 20]
+
+A throw-away database is filled with synthetic readings (one every 5 seconds
+per node), then the hot queries are timed before and after migration 1 creates the
+time-series indexes.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from database import Database, MIGRATIONS
+
+START_TIME = '2024-01-01 00:00:00'
+
+
+def populate(db, rows, nodes):
+    """Generate synthetic readings and alerts directly in SQLite"""
+    conn = db.get_connection()
+    with conn:
+        conn.execute(
+            '''
+            WITH RECURSIVE seq(x) AS (
+                SELECT 0 UNION ALL SELECT x + 1 FROM seq LIMIT ?
+            )
+            INSERT INTO sensor_data (node_id, temperature, humidity, timestamp)
+            SELECT x % ?,
+                   15 + (x % 250) / 10.0,
+                   40 + (x % 500) / 10.0,
+                   datetime(?, '+' || ((x / ?) * 5) || ' seconds')
+            FROM seq
+            ''',
+            (rows, nodes, START_TIME, nodes)
+        )
+        # One alert per ~1000 readings, spread over the first half of the range
+        conn.execute(
+            '''
+            INSERT INTO alerts (node_id, message, severity, timestamp)
+            SELECT node_id, 'benchmark alert', 'high', timestamp
+            FROM sensor_data
+            WHERE id % 1000 = 0 AND id < ?
+            ''',
+            (rows // 2,)
+        )
+
+
+# Indexes created by migration 1, the ones this benchmark measures
+TIME_SERIES_INDEXES = ('idx_sensor_data_node_ts', 'idx_sensor_data_ts', 'idx_alerts_ts')
+
+
+def drop_indexes(db):
+    """Remove the time-series indexes, the rest of the schema stays migrated"""
+    conn = db.get_connection()
+    for name in TIME_SERIES_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def create_indexes(db):
+    """Re-apply migration 1 (idempotent CREATE INDEX IF NOT EXISTS and ANALYZE)"""
+    conn = db.get_connection()
+    with conn:
+        for statement in MIGRATIONS[0]:
+            conn.execute(statement)
+
+
+def queries(rows, nodes):
+    """Hot queries as (label, sql, params)"""
+    middle = rows // nodes // 2 * 5
+    return [
+        ("latest 100 readings",
+         "SELECT node_id, temperature, humidity, timestamp FROM sensor_data "
+         "ORDER BY timestamp DESC LIMIT 100", ()),
+        ("latest 100 for one node",
+         "SELECT node_id, temperature, humidity, timestamp FROM sensor_data "
+         "WHERE node_id = ? ORDER BY timestamp DESC LIMIT 100", (1,)),
+        ("one node, 1 hour window",
+         "SELECT COUNT(*), AVG(temperature) FROM sensor_data WHERE node_id = ? "
+         "AND timestamp BETWEEN datetime(?, ?) AND datetime(?, ?)",
+         (1, START_TIME, f"+{middle} seconds", START_TIME, f"+{middle + 3600} seconds")),
+        ("newest alert timestamp",
+         "SELECT MAX(timestamp) FROM alerts", ()),
+        ("readings pending threshold check",
+         "SELECT COUNT(*) FROM sensor_data "
+         "WHERE timestamp > COALESCE((SELECT MAX(timestamp) FROM alerts), '')", ()),
+    ]
+
+
+def time_query(db, sql, params, repeat):
+    """Median latency in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.fetch_all(sql, params)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--nodes', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.sqlite'))
+        started = time.perf_counter()
+        drop_indexes(db)
+        populate(db, args.rows, args.nodes)
+        print(f"Generated {args.rows:,} readings in {time.perf_counter() - started:.1f}s")
+
+        # Without indexes, full scans: fewer repetitions keep the run bounded
+        baseline = {
+            label: time_query(db, sql, params, max(1, args.repeat // 10))
+            for label, sql, params in queries(args.rows, args.nodes)
+        }
+
+        started = time.perf_counter()
+        create_indexes(db)
+        print(f"Migration (index build) took {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'query':<36}{'no index (ms)':>16}{'indexed (ms)':>16}")
+        for label, sql, params in queries(args.rows, args.nodes):
+            indexed = time_query(db, sql, params, args.repeat)
+            print(f"{label:<36}{baseline[label]:>16.2f}{indexed:>16.2f}")
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    main()
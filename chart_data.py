@@ -0,0 +1,136 @@
+"""Chart data layer for the desktop client.
+
+Sorts node readings into numpy columns (timestamps parsed in one
+vectorised call), downsamples them to screen resolution with
+largest-triangle-three-buckets (LTTB) and keeps one reusable figure per node
+whose lines are updated in place on refresh.
+"""
+import numpy as np
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from config import Config
+from timestamps import to_datetime64
+
+_style_applied = False
+
+
+def apply_style():
+    """Apply the chart style once per process (it changes global rcParams)"""
+    global _style_applied
+    if not _style_applied:
+        plt.style.use('seaborn-v0_8')
+        _style_applied = True
+
+
+def lttb(x, y, threshold):
+    """Downsample a series to threshold points with largest-triangle-three-buckets.
+
+    Keeps the first and last points and, for each bucket in between, the point
+    forming the largest triangle with the previously kept point and the mean of
+    the next bucket, which preserves peaks and troughs. Returns (x, y) arrays.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    # Bucket edges over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    sampled = np.empty(threshold, dtype=np.intp)
+    sampled[0] = 0
+    sampled[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        sampled[bucket + 1] = previous
+    return x[sampled], y[sampled]
+
+
+def sort_series(timestamps, temperatures, humidities):
+    """Columns as numpy arrays ordered by time, readings without a valid timestamp dropped"""
+    times = to_datetime64(timestamps)
+    temperatures = np.asarray(temperatures, dtype=float)
+    humidities = np.asarray(humidities, dtype=float)
+    valid = ~np.isnat(times)
+    order = np.argsort(times[valid], kind='stable')
+    return times[valid][order], temperatures[valid][order], humidities[valid][order]
+
+
+class NodeChart:
+    """Temperature and humidity chart of one node, embedded in a Tk container.
+
+    The figure, axes, threshold lines and canvas are built once; update()
+    only replaces the line data.
+    """
+    METRICS = (
+        ('Temperature', 'Temperature (°C)', 'red', '°C',
+         Config.TEMP_HIGH_THRESHOLD, Config.TEMP_CRITICAL_THRESHOLD, Config.TEMP_LOW_THRESHOLD),
+        ('Humidity', 'Humidity (%)', 'blue', '%',
+         Config.HUMIDITY_HIGH_THRESHOLD, Config.HUMIDITY_CRITICAL_THRESHOLD, Config.HUMIDITY_LOW_THRESHOLD),
+    )
+
+    def __init__(self, master, node_id):
+        apply_style()
+        self.node_id = node_id
+        self.figure = Figure(figsize=(12, 8), dpi=100, facecolor='#f5f5f5')
+        self.figure.suptitle(f"Node {node_id} Sensor Data", fontsize=14, fontweight='bold')
+        self.axes = []
+        self.lines = []
+
+        for position, (title, label, color, unit, high, critical, low) in enumerate(self.METRICS, start=1):
+            ax = self.figure.add_subplot(2, 1, position)
+            line, = ax.plot([], [], '-', color=color, linewidth=2, markersize=4,
+                            markerfacecolor='white', markeredgecolor=color)
+            ax.set_title(title, fontsize=12, pad=10)
+            ax.set_ylabel(label, fontsize=10)
+            ax.grid(True, linestyle='--', alpha=0.7)
+            ax.set_facecolor('#f9f9f9')
+            ax.xaxis_date()
+
+            # Threshold lines, annotated at the left edge whatever the data range
+            for name, value, line_color, offset in (
+                ('High', high, 'orange', 10), ('Critical', critical, 'red', 10), ('Low', low, 'blue', -20)
+            ):
+                ax.axhline(y=value, color=line_color, linestyle='--', linewidth=1)
+                ax.annotate(f'{name} Threshold ({value}{unit})',
+                            xy=(0, value), xycoords=('axes fraction', 'data'),
+                            xytext=(10, offset), textcoords='offset points',
+                            color=line_color, fontsize=8)
+
+            ax.tick_params(axis='x', labelrotation=45)
+            ax.tick_params(axis='both', which='major', labelsize=8)
+            self.axes.append(ax)
+            self.lines.append(line)
+
+        self.figure.tight_layout(rect=[0, 0, 1, 0.96])
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+
+    def update(self, timestamps, temperatures, humidities, max_points=None):
+        """Replace the plotted series, downsampled to max_points per line"""
+        max_points = max_points or Config.CHART_MAX_POINTS
+        x = mdates.date2num(timestamps)
+        for ax, line, values in zip(self.axes, self.lines, (temperatures, humidities)):
+            line_x, line_y = lttb(x, values, max_points)
+            line.set_data(line_x, line_y)
+            # Markers only while individual readings are distinguishable
+            line.set_marker('o' if len(line_x) <= Config.CHART_MARKER_LIMIT else '')
+            ax.relim()
+            ax.autoscale_view()
+        self.canvas.draw_idle()
+
@@ -3,9 +3,12 @@ from tkinter import ttk, messagebox, filedialog
 from database import Database
 from csv_manager import CSVManager
 from config import Config
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
+import thresholds
+import chart_data
+import virtual_table
+import ui_worker
+import node_cache
+import tail_reader
 from datetime import datetime, timedelta
 import os
 import csv
@@ -13,20 +16,172 @@ import random
 import json
 from PIL import Image, ImageTk
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+import queue
+import threading
+import bisect
+from operator import itemgetter
+
+class SensorReplica:
+    """Local copy of the server's readings and alerts, kept current by delta sync"""
+    def __init__(self):
+        self.reset()
+    
+    def reset(self, epoch=None):
+        """Forget everything, e.g. after the server restarted"""
+        self.epoch = epoch
+        self.reading_seq = 0
+        self.alert_seq = 0
+        self.readings = {}  # node_id -> list of reading dicts, oldest first
+        self.alerts = {}    # alert id -> alert dict
+    
+    def add_reading(self, reading):
+        """Add one reading unless already seen, returns True if it was new"""
+        if reading['seq'] <= self.reading_seq:
+            return False
+        node_readings = self.readings.setdefault(str(reading['node_id']), [])
+        node_readings.append(reading)
+        # Mirror the server's per-node retention
+        if len(node_readings) > Config.NODE_BUFFER_CAPACITY:
+            del node_readings[:len(node_readings) - Config.NODE_BUFFER_CAPACITY]
+        self.reading_seq = reading['seq']
+        return True
+    
+    def add_alert(self, alert):
+        """Add or update one alert unless already seen, returns True if it was new or changed"""
+        if alert['seq'] <= self.alert_seq:
+            return False
+        # An incident alert updated by the server comes again with a new seq,
+        # a deleted one as a tombstone
+        self.alerts.pop(alert['id'], None)
+        if not alert.get('deleted'):
+            self.alerts[alert['id']] = alert
+        while len(self.alerts) > Config.ALERT_BUFFER_CAPACITY:
+            del self.alerts[next(iter(self.alerts))]
+        self.alert_seq = alert['seq']
+        return True
+    
+    def apply(self, changes):
+        """Merge one /api/sync response, returns (new_reading_count, new_alert_count)"""
+        if changes.get('epoch') != self.epoch:
+            self.reset(changes.get('epoch'))
+        
+        new_readings = sum(self.add_reading(reading) for reading in changes.get('readings', []))
+        new_alerts = sum(self.add_alert(alert) for alert in changes.get('alerts', []))
+        
+        self.reading_seq = max(self.reading_seq, changes.get('reading_seq', 0))
+        self.alert_seq = max(self.alert_seq, changes.get('alert_seq', 0))
+        return new_readings, new_alerts
+    
+    def is_behind(self, positions):
+        """Whether a hello/resync event announces entries this replica has not seen"""
+        return (positions.get('epoch') != self.epoch
+                or positions.get('reading_seq', 0) > self.reading_seq
+                or positions.get('alert_seq', 0) > self.alert_seq)
+    
+    def alert_rows(self):
+        """Alerts as (id, node_id, message, severity, timestamp) rows, newest first"""
+        return [
+            (alert['id'], alert['node_id'], alert['message'], alert['severity'], alert['timestamp'])
+            for alert in reversed(list(self.alerts.values()))
+        ]
 
 class ServerCommunicator:
     def __init__(self, base_url="http://localhost:5000"):
         self.base_url = base_url
+        self.replica = SensorReplica()
+        self.session = self.create_session()
+    
+    def create_session(self):
+        """HTTP session with pooled keep-alive connections and retries with backoff.
+        
+        Only GET requests are retried, so a reading is never posted twice.
+        Responses are gzip-compressed by the server (requests sends
+        Accept-Encoding: gzip and decodes transparently).
+        """
+        retry = Retry(
+            total=Config.REQUEST_RETRIES,
+            backoff_factor=Config.REQUEST_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        # Worker threads plus the live event stream each hold a connection
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=Config.WORKER_THREADS + 1)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def sync(self):
+        """Fetch readings and alerts added since the last sync into the replica.
+        
+        Returns (new_reading_count, new_alert_count), or None if the server
+        could not be reached. Blocks on the network: the desktop app calls
+        fetch_changes on a worker thread and apply_changes on the Tk thread.
+        """
+        replica = self.replica
+        return self.apply_changes(self.fetch_changes(replica.epoch, replica.reading_seq, replica.alert_seq))
+    
+    def fetch_changes(self, epoch, readings_after, alerts_after):
+        """Fetch every /api/sync page after the given positions, returns the pages or None.
         
-    def get_sensor_data(self, node_id=None):
-        """Get sensor data from server"""
+        Does not touch the replica, so it is safe to run on any thread.
+        """
+        pages = []
+        try:
+            while True:
+                response = self.session.get(
+                    f"{self.base_url}/api/sync",
+                    params={
+                        'epoch': epoch or '',
+                        'readings_after': readings_after,
+                        'alerts_after': alerts_after
+                    },
+                    timeout=Config.REQUEST_TIMEOUT
+                )
+                if response.status_code != 200:
+                    return None
+                changes = response.json()
+                pages.append(changes)
+                epoch = changes.get('epoch')
+                readings_after = changes.get('reading_seq', readings_after)
+                alerts_after = changes.get('alert_seq', alerts_after)
+                if not changes.get('has_more'):
+                    return pages
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error syncing with server: {e}")
+            return None
+    
+    def apply_changes(self, pages):
+        """Merge fetched sync pages into the replica, returns (new_readings, new_alerts) or None"""
+        if pages is None:
+            return None
+        new_readings = new_alerts = 0
+        for changes in pages:
+            if changes.get('epoch') != self.replica.epoch:
+                new_readings = new_alerts = 0
+            readings, alerts = self.replica.apply(changes)
+            new_readings += readings
+            new_alerts += alerts
+        return new_readings, new_alerts
+        
+    def get_sensor_data(self, node_id=None, since=None, until=None, limit=None, cursor=None):
+        """Get sensor data from server, optionally one page or time window of it"""
         try:
             url = f"{self.base_url}/api/get_data"
-            if node_id:
-                url += f"?node_id={node_id}"
+            params = {
+                'node_id': node_id,
+                'since': since,
+                'until': until,
+                'limit': limit,
+                'cursor': cursor
+            }
+            params = {key: value for key, value in params.items() if value}
                 
-            response = requests.get(url)
+            response = self.session.get(url, params=params, timeout=Config.REQUEST_TIMEOUT)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -37,7 +192,7 @@ class ServerCommunicator:
     def get_alerts(self):
         """Get alerts from server"""
         try:
-            response = requests.get(f"{self.base_url}/api/get_alerts")
+            response = self.session.get(f"{self.base_url}/api/get_alerts", timeout=Config.REQUEST_TIMEOUT)
             if response.status_code == 200:
                 return response.json()
             return None
@@ -45,6 +200,70 @@ class ServerCommunicator:
             print(f"Error getting alerts: {e}")
             return None
             
+    def mark_alerts_read(self, alert_ids):
+        """Mark alerts as read on the server, returns the number updated or None on failure"""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/mark_alerts_read",
+                json={"ids": list(alert_ids)},
+                timeout=Config.REQUEST_TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json().get('updated', 0)
+            return None
+        except requests.RequestException as e:
+            print(f"Error marking alerts as read: {e}")
+            return None
+    
+    def delete_alerts(self, alert_ids):
+        """Delete alerts on the server, returns the number deleted or None on failure"""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/delete_alerts",
+                json={"ids": list(alert_ids)},
+                timeout=Config.REQUEST_TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json().get('deleted', 0)
+            return None
+        except requests.RequestException as e:
+            print(f"Error deleting alerts: {e}")
+            return None
+            
+    def stream_events(self, handle_event, stop_event):
+        """Consume the server's event stream, calling handle_event(event, data) per event.
+        
+        Returns when the server closes the stream or stop_event is set;
+        connection errors propagate as requests exceptions.
+        """
+        response = self.session.get(
+            f"{self.base_url}/api/stream",
+            stream=True,
+            # Heartbeats arrive well within the read timeout on a healthy stream
+            timeout=(Config.REQUEST_TIMEOUT[0], Config.STREAM_HEARTBEAT_SECONDS * 2)
+        )
+        with response:
+            if response.status_code != 200:
+                raise requests.RequestException(f"Stream refused with HTTP {response.status_code}")
+            event, data_lines = 'message', []
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if stop_event.is_set():
+                    return
+                if not line:
+                    # Blank line: dispatch the event collected so far
+                    if data_lines:
+                        handle_event(event, json.loads('\n'.join(data_lines)))
+                    event, data_lines = 'message', []
+                    continue
+                if line.startswith(':'):
+                    continue
+                field, _, value = line.partition(':')
+                value = value[1:] if value.startswith(' ') else value
+                if field == 'event':
+                    event = value
+                elif field == 'data':
+                    data_lines.append(value)
+    
     def send_test_data(self):
         """Send test data to server (for debugging)"""
         try:
@@ -54,9 +273,10 @@ class ServerCommunicator:
                 "humidity": random.uniform(20, 95),
                 "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/sensor_data",
-                json=data
+                json=data,
+                timeout=Config.REQUEST_TIMEOUT
             )
             return response.status_code == 200
         except requests.RequestException as e:
@@ -78,6 +298,30 @@ class ForestMonitoringApp:
         self.animation_items = []
         self.data_refresh_interval = 5000  # 5 seconds
         self.current_view = None
+        self.worker = ui_worker.BackgroundWorker(self.root)
+        # Decrypted columns of the local data files, shared by the table and charts
+        self.node_cache = node_cache.NodeDataCache('data')
+        # Bytes of each data file already checked for alerts, kept across restarts
+        self.alert_reader = tail_reader.TailReader(Config.ALERT_CHECKPOINT_FILE)
+        self.node_charts = {}  # node_id -> chart_data.NodeChart of the open charts view
+        self.charts_frame = None
+        self.inbox_frame = None
+        self.inbox_source = 'server'  # Owner of the alert ids shown in the inbox
+        
+        # Data table rows, kept across refreshes so only new readings are loaded
+        self.table_store = virtual_table.ColumnStore()
+        self.table_source = None     # ('replica', epoch) or 'csv'
+        self.table_positions = {}    # node -> last seq, or file path -> (cache generation, rows loaded)
+        self.table_generation = 0    # Bumped on reset so stale background loads are dropped
+        self.table_frame = None
+        self.data_table = None       # virtual_table.VirtualTable of the open table view
+        
+        # Live push channel (server-sent events consumed on a background thread)
+        self.live_events = queue.Queue(maxsize=Config.STREAM_QUEUE_SIZE)
+        self.live_overflow = False
+        self.live_connected = False
+        self.live_stop = threading.Event()
+        self.live_thread = None
         
         # Set style
         self.setup_styles()
@@ -212,6 +456,11 @@ class ForestMonitoringApp:
         """Clear only the content area"""
         for widget in self.content_frame.winfo_children():
             widget.destroy()
+        self.node_charts = {}
+        self.charts_frame = None
+        self.inbox_frame = None
+        self.table_frame = None
+        self.data_table = None
     
     def create_animation(self):
         """Create falling characters animation for login screen"""
@@ -354,9 +603,10 @@ class ForestMonitoringApp:
             self.nav_frame.pack(fill=tk.X, before=self.content_frame)
             self.show_dashboard()
             self.schedule_data_refresh()  # Start periodic refresh
+            self.start_live_updates()  # Push channel for readings and alerts
 
             # Check for alerts in existing data
-            self.check_csv_for_alerts()
+            self.worker.submit(self.check_csv_for_alerts, key='alerts')
         else:
             self.login_error_label.config(text="Invalid username or password")
             self.password_entry.delete(0, tk.END)
@@ -371,75 +621,25 @@ class ForestMonitoringApp:
             self.root.after(30)
     
     def check_csv_for_alerts(self):
-        """Check all CSV files for threshold violations and create alerts"""
+        """Check readings of the local data files not checked yet for threshold violations and create alerts"""
         try:
-            for csv_file in self.csv_manager.get_csv_files():
-                filepath = os.path.join('data', csv_file)
-                
-                with open(filepath, 'r') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        try:
-                            node_id = int(row.get('node_id', 0))
-                            temp = float(row.get('temperature', 0))
-                            humidity = float(row.get('humidity', 0))
-                            timestamp = row.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-                            
-                            # Check temperature thresholds
-                            if temp >= Config.TEMP_CRITICAL_THRESHOLD:
-                                self.db.add_alert(
-                                    node_id,
-                                    f"Node {node_id}: Critical high temperature ({temp}°C)",
-                                    "critical",
-                                    timestamp
-                                )
-                            elif temp >= Config.TEMP_HIGH_THRESHOLD:
-                                self.db.add_alert(
-                                    node_id,
-                                    f"Node {node_id}: High temperature ({temp}°C)",
-                                    "high",
-                                    timestamp
-                                )
-                            elif temp <= Config.TEMP_LOW_THRESHOLD:
-                                self.db.add_alert(
-                                    node_id,
-                                    f"Node {node_id}: Low temperature ({temp}°C)",
-                                    "high",
-                                    timestamp
-                                )
-                            
-                            # Check humidity thresholds
-                            if humidity >= Config.HUMIDITY_CRITICAL_THRESHOLD:
-                                self.db.add_alert(
-                                    node_id,
-                                    f"Node {node_id}: Critical high humidity ({humidity}%)",
-                                    "critical",
-                                    timestamp
-                                )
-                            elif humidity >= Config.HUMIDITY_HIGH_THRESHOLD:
-                                self.db.add_alert(
-                                    node_id,
-                                    f"Node {node_id}: High humidity ({humidity}%)",
-                                    "high",
-                                    timestamp
-                                )
-                            elif humidity <= Config.HUMIDITY_LOW_THRESHOLD:
-                                self.db.add_alert(
-                                    node_id,
-                                    f"Node {node_id}: Low humidity ({humidity}%)",
-                                    "high",
-                                    timestamp
-                                )
-                                
-                        except (ValueError, KeyError) as e:
-                            print(f"Error processing row: {e}")
-                            continue
+            for path in self.node_cache.paths():
+                for records in self.alert_reader.iter_batches(path):
+                    if not records:
+                        continue
+                    node_ids, timestamps, temps, humidities = zip(*records)
+                    alerts = thresholds.alerts_for(node_ids, temps, humidities, timestamps)
+                    if alerts:
+                        self.db.add_alerts_bulk(alerts)
+                # Only positions whose alerts are committed are saved
+                self.alert_reader.save()
         except Exception as e:
             print(f"Error checking CSV for alerts: {e}")
     
     def logout(self):
         """Secure logout - hides all content and returns to login"""
         self.current_user = None
+        self.stop_live_updates()
         self.nav_frame.pack_forget()
         self.show_login()
     
@@ -574,13 +774,19 @@ class ForestMonitoringApp:
                 messagebox.showerror("Error", f"Invalid CSV file: {str(e)}")
                 return
             
-            success, message = self.csv_manager.import_csv(filepath)
-            if success:
-                messagebox.showinfo("Success", message)
-                self.show_csv_tools()
-                self.check_csv_for_alerts()  # Check for alerts in new data
-            else:
-                messagebox.showerror("Error", message)
+            def done(result):
+                success, message = result
+                if success:
+                    messagebox.showinfo("Success", message)
+                    if self.current_view == "csv_tools":
+                        self.show_csv_tools()
+                    self.worker.submit(self.check_csv_for_alerts, key='alerts')  # Check for alerts in new data
+                else:
+                    messagebox.showerror("Error", message)
+            
+            # Large files take a while: import on the worker, one import at a time
+            if not self.worker.submit(self.csv_manager.import_csv, filepath, on_done=done, key='csv_files'):
+                messagebox.showwarning("Warning", "Another CSV import or export is still running")
     
     def view_csv_content(self, tree):
         """View content of selected CSV file in a new window"""
@@ -592,12 +798,17 @@ class ForestMonitoringApp:
         filename = tree.item(selected)['values'][0]
         filepath = os.path.join('data', filename)
         
-        try:
-            with open(filepath, 'r') as f:
+        def read(path):
+            with open(path, 'r') as f:
                 reader = csv.DictReader(f)
-                headers = reader.fieldnames
-                rows = list(reader)
-            
+                return reader.fieldnames, list(reader)
+        
+        self.worker.submit(read, filepath, on_done=lambda content: self.show_csv_content(filename, *content),
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to read file: {str(e)}"))
+    
+    def show_csv_content(self, filename, headers, rows):
+        """Popup listing the rows of a CSV file read by view_csv_content (Tk thread)"""
+        try:
             # Create popup window
             popup = tk.Toplevel(self.root)
             popup.title(f"Viewing: {filename}")
@@ -650,12 +861,18 @@ class ForestMonitoringApp:
         )
         
         if confirm:
-            success, message = self.csv_manager.delete_csv(filename)
-            if success:
-                messagebox.showinfo("Success", message)
-                self.show_csv_tools()
-            else:
-                messagebox.showerror("Error", message)
+            def done(result):
+                success, message = result
+                if success:
+                    messagebox.showinfo("Success", message)
+                    if self.current_view == "csv_tools":
+                        self.show_csv_tools()
+                else:
+                    messagebox.showerror("Error", message)
+            
+            # Shares the import checkpoints: never while an import runs
+            if not self.worker.submit(self.csv_manager.delete_csv, filename, on_done=done, key='csv_files'):
+                messagebox.showwarning("Warning", "Another CSV import or export is still running")
     
     def export_data(self):
         """Export sensor data to CSV with confirmation"""
@@ -665,12 +882,17 @@ class ForestMonitoringApp:
         )
         
         if confirm:
-            success, message = self.csv_manager.export_to_csv()
-            if success:
-                messagebox.showinfo("Success", message)
-                self.show_csv_tools()
-            else:
-                messagebox.showerror("Error", message)
+            def done(result):
+                success, message = result
+                if success:
+                    messagebox.showinfo("Success", message)
+                    if self.current_view == "csv_tools":
+                        self.show_csv_tools()
+                else:
+                    messagebox.showerror("Error", message)
+            
+            if not self.worker.submit(self.csv_manager.export_to_csv, on_done=done, key='csv_files'):
+                messagebox.showwarning("Warning", "Another CSV import or export is still running")
     
     def show_data_table(self):
         """Show sensor data in table view with threshold highlighting"""
@@ -687,129 +909,131 @@ class ForestMonitoringApp:
             style='Title.TLabel'
         ).pack(side=tk.LEFT, padx=20)
         
-        # Try to get data from server first, fall back to CSV files
-        data = []
-        server_data = self.server.get_sensor_data()
-        
-        if server_data and server_data.get('status') == 'success':
-            # Process server data
-            nodes = server_data.get('data', {})
-            for node_id, readings in nodes.items():
-                for reading in readings:
-                    try:
-                        node_id = reading.get('node_id', 'N/A')
-                        temp = float(reading.get('temperature', 0))
-                        hum = float(reading.get('humidity', 0))
-                        timestamp = reading.get('timestamp', 'N/A')
-                        
-                        # Determine status
-                        status = []
-                        if temp >= Config.TEMP_CRITICAL_THRESHOLD:
-                            status.append("CRITICAL HIGH TEMP")
-                        elif temp >= Config.TEMP_HIGH_THRESHOLD:
-                            status.append("HIGH TEMP")
-                        elif temp <= Config.TEMP_LOW_THRESHOLD:
-                            status.append("LOW TEMP")
-                            
-                        if hum >= Config.HUMIDITY_CRITICAL_THRESHOLD:
-                            status.append("CRITICAL HIGH HUMIDITY")
-                        elif hum >= Config.HUMIDITY_HIGH_THRESHOLD:
-                            status.append("HIGH HUMIDITY")
-                        elif hum <= Config.HUMIDITY_LOW_THRESHOLD:
-                            status.append("LOW HUMIDITY")
-                            
-                        status_text = ", ".join(status) if status else "Normal"
-                        
-                        data.append((node_id, temp, hum, timestamp, status_text))
-                    except ValueError:
-                        continue
-        else:
-            # Fall back to CSV data
-            for csv_file in self.csv_manager.get_csv_files():
-                with open(os.path.join('data', csv_file), 'r') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        try:
-                            node_id = row.get('node_id', 'N/A')
-                            temp = float(row.get('temperature', 0))
-                            hum = float(row.get('humidity', 0))
-                            timestamp = row.get('timestamp', 'N/A')
-                            
-                            # Determine status
-                            status = []
-                            if temp >= Config.TEMP_CRITICAL_THRESHOLD:
-                                status.append("CRITICAL HIGH TEMP")
-                            elif temp >= Config.TEMP_HIGH_THRESHOLD:
-                                status.append("HIGH TEMP")
-                            elif temp <= Config.TEMP_LOW_THRESHOLD:
-                                status.append("LOW TEMP")
-                                
-                            if hum >= Config.HUMIDITY_CRITICAL_THRESHOLD:
-                                status.append("CRITICAL HIGH HUMIDITY")
-                            elif hum >= Config.HUMIDITY_HIGH_THRESHOLD:
-                                status.append("HIGH HUMIDITY")
-                            elif hum <= Config.HUMIDITY_LOW_THRESHOLD:
-                                status.append("LOW HUMIDITY")
-                                
-                            status_text = ", ".join(status) if status else "Normal"
-                            
-                            data.append((node_id, temp, hum, timestamp, status_text))
-                        except ValueError:
-                            continue
-        
-        if not data:
-            ttk.Label(self.content_frame, text="No sensor data available").pack()
-            return
-        
-        # Create frame for table
-        table_frame = ttk.Frame(self.content_frame)
-        table_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-        
-        # Create treeview widget
-        tree = ttk.Treeview(
-            table_frame,
-            columns=('node_id', 'temperature', 'humidity', 'timestamp', 'status'),
-            show='headings',
-            selectmode='extended'
-        )
+        self.table_frame = ttk.Frame(self.content_frame)
+        self.table_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        self.table_message = ttk.Label(self.table_frame, text="Loading sensor data...")
+        self.table_message.pack()
         
-        # Define headings
-        tree.heading('node_id', text='Node ID')
-        tree.heading('temperature', text='Temperature (°C)')
-        tree.heading('humidity', text='Humidity (%)')
-        tree.heading('timestamp', text='Timestamp')
-        tree.heading('status', text='Status')
+        # Rows already loaded show at once; new ones arrive from the background
+        self.on_table_rows(None)
+        self.load_table_rows(self.on_table_rows)
+    
+    def on_table_rows(self, added):
+        """Show the table store in the open table view (Tk thread).
         
-        # Define column widths
-        tree.column('node_id', width=100, anchor=tk.CENTER)
-        tree.column('temperature', width=150, anchor=tk.CENTER)
-        tree.column('humidity', width=150, anchor=tk.CENTER)
-        tree.column('timestamp', width=200, anchor=tk.CENTER)
-        tree.column('status', width=300)
+        added is whether new rows were just loaded, None before the first load.
+        """
+        if self.current_view != "data_table" or self.table_frame is None:
+            return
+        if self.data_table is not None:
+            if added or self.data_table.offset >= len(self.table_store):
+                self.data_table.refresh()
+            return
+        if not len(self.table_store):
+            if added is not None:
+                self.table_message.configure(text="No sensor data available")
+            return
         
-        # Add data to treeview with color coding for thresholds
-        for row in data:
-            node_id, temp, hum, timestamp, status = row
-            tags = ()
-            
-            if "CRITICAL" in status:
-                tags = ('critical',)
-            elif "HIGH" in status or "LOW" in status:
-                tags = ('warning',)
-            
-            tree.insert('', tk.END, values=row, tags=tags)
+        self.table_message.destroy()
+        # Virtual table: only the visible rows exist as Treeview items
+        self.data_table = virtual_table.VirtualTable(
+            self.table_frame,
+            self.table_store,
+            columns=[
+                ('node_id', 'Node ID', {'width': 100, 'anchor': tk.CENTER}),
+                ('temperature', 'Temperature (°C)', {'width': 150, 'anchor': tk.CENTER}),
+                ('humidity', 'Humidity (%)', {'width': 150, 'anchor': tk.CENTER}),
+                ('timestamp', 'Timestamp', {'width': 200, 'anchor': tk.CENTER}),
+                ('status', 'Status', {'width': 300}),
+            ],
+            tags_for=self.status_tags
+        )
+        self.data_table.pack(fill=tk.BOTH, expand=True)
         
         # Configure tag colors
-        tree.tag_configure('warning', background='#fff3cd')  # Light yellow
-        tree.tag_configure('critical', background='#ffcccc')  # Light red
-        
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
+        self.data_table.tree.tag_configure('warning', background='#fff3cd')  # Light yellow
+        self.data_table.tree.tag_configure('critical', background='#ffcccc')  # Light red
+        self.data_table.refresh()
+    
+    def status_tags(self, row):
+        """Row color tags for threshold highlighting"""
+        status = row[4]
+        if "CRITICAL" in status:
+            return ('critical',)
+        if "HIGH" in status or "LOW" in status:
+            return ('warning',)
+        return ()
+    
+    def load_table_rows(self, on_done):
+        """Append readings not yet in the table store, then call on_done(added) on the Tk thread.
+        
+        Reads the synced server replica, or the CSV files when the server is
+        unreachable, remembering per node (last seq) or per file (byte offset)
+        what was already loaded. Switching source or a server restart reloads
+        from scratch. Network and file reads run in the background.
+        """
+        if self.live_connected:
+            on_done(self.append_replica_rows())
+        else:
+            self.sync_in_background(lambda changes: self.on_table_sync(changes, on_done))
+    
+    def on_table_sync(self, changes, on_done):
+        if changes is not None or self.live_connected:
+            on_done(self.append_replica_rows())
+            return
         
-        # Pack widgets
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Server unreachable: fall back to CSV data
+        if self.table_source != 'csv':
+            self.reset_table('csv')
+        generation = self.table_generation
+        
+        def append(result):
+            columns, positions, reloaded = result
+            if generation != self.table_generation:
+                return  # The store was reset meanwhile, these rows are stale
+            if reloaded:
+                self.reset_table('csv')
+            self.table_positions = positions
+            self.table_store.extend(*columns)
+            on_done(bool(columns[0]))
+        
+        self.worker.submit(self.node_cache.read_new_classified, dict(self.table_positions), on_done=append, key='table_csv')
+    
+    def append_replica_rows(self):
+        """Append replica readings newer than those in the table store, returns True if any"""
+        replica = self.server.replica
+        if self.table_source != ('replica', replica.epoch):
+            self.reset_table(('replica', replica.epoch))
+        node_ids, temps, hums, timestamps = [], [], [], []
+        for node_key, readings in replica.readings.items():
+            start = bisect.bisect_right(readings, self.table_positions.get(node_key, 0), key=itemgetter('seq'))
+            for reading in readings[start:]:
+                node_ids.append(reading.get('node_id', node_key))
+                temps.append(float(reading.get('temperature', 0)))
+                hums.append(float(reading.get('humidity', 0)))
+                timestamps.append(reading.get('timestamp', 'N/A'))
+            if readings:
+                self.table_positions[node_key] = readings[-1]['seq']
+        
+        # Classify only the new readings, in one call
+        self.table_store.extend(node_ids, temps, hums, timestamps)
+        return bool(timestamps)
+    
+    def reset_table(self, source):
+        """Empty the table store before loading from another source"""
+        self.table_store.clear()
+        self.table_positions = {}
+        self.table_source = source
+        self.table_generation += 1
+        if self.data_table is not None:
+            self.data_table.selected.clear()
+    
+    def update_data_table(self):
+        """Append new readings to the open table, keeping scroll position and selection"""
+        if self.table_frame is None:
+            self.show_data_table()
+        else:
+            self.load_table_rows(self.on_table_rows)
     
     def show_data_charts(self):
         """Show beautiful data visualization charts per node"""
@@ -826,123 +1050,41 @@ class ForestMonitoringApp:
             style='Title.TLabel'
         ).pack(side=tk.LEFT, padx=20)
         
-        # Get data from CSV files grouped by node
-        node_data = {}
-        
-        for csv_file in self.csv_manager.get_csv_files():
-            with open(os.path.join('data', csv_file), 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        node_id = int(row['node_id'])
-                        if node_id not in node_data:
-                            node_data[node_id] = []
-                            
-                        timestamp = datetime.strptime(row['timestamp'], '%Y-%m-%d %H:%M:%S')
-                        temp = float(row['temperature'])
-                        hum = float(row['humidity'])
-                            
-                        node_data[node_id].append((timestamp, temp, hum))
-                    except (KeyError, ValueError) as e:
-                        print(f"Error processing row: {e}")
-                        continue
+        self.charts_frame = ttk.Frame(self.content_frame)
+        self.charts_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        ttk.Label(self.charts_frame, text="Loading sensor data...").pack()
+        self.update_data_charts()
+    
+    def update_data_charts(self):
+        """Reload the chart series in the background"""
+        self.worker.submit(self.node_cache.node_series, on_done=self.on_chart_series, key='charts')
+    
+    def on_chart_series(self, node_series):
+        """Update the open charts in place, building them when nodes appear (Tk thread)"""
+        if self.current_view != "data_charts" or self.charts_frame is None:
+            return
+        if self.node_charts and not set(node_series) - set(self.node_charts):
+            for node_id, series in node_series.items():
+                self.node_charts[node_id].update(*series)
+            return
         
-        if not node_data:
-            ttk.Label(self.content_frame, text="No sensor data available").pack()
+        for widget in self.charts_frame.winfo_children():
+            widget.destroy()
+        self.node_charts = {}
+        if not node_series:
+            ttk.Label(self.charts_frame, text="No sensor data available").pack()
             return
         
         # Create notebook for tabbed interface
-        notebook = ttk.Notebook(self.content_frame)
-        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        notebook = ttk.Notebook(self.charts_frame)
+        notebook.pack(fill=tk.BOTH, expand=True)
         
-        # Create a tab for each node
-        for node_id, data in sorted(node_data.items()):
-            if not data:
-                continue
-                
+        # Create a tab for each node; the charts are reused by refresh_data
+        for node_id, series in sorted(node_series.items()):
             tab = ttk.Frame(notebook)
             notebook.add(tab, text=f"Node {node_id}")
-            
-            # Sort data by timestamp
-            data.sort(key=lambda x: x[0])
-            timestamps = [x[0] for x in data]
-            temps = [x[1] for x in data]
-            hums = [x[2] for x in data]
-            
-            # Create figure with custom style
-            plt.style.use('seaborn-v0_8')
-            fig = Figure(figsize=(12, 8), dpi=100, facecolor='#f5f5f5')
-            fig.suptitle(f"Node {node_id} Sensor Data", fontsize=14, fontweight='bold')
-            
-            # Temperature plot
-            ax1 = fig.add_subplot(211)
-            ax1.plot(timestamps, temps, 'r-', linewidth=2, marker='o', markersize=4, 
-                     markerfacecolor='white', markeredgecolor='red')
-            ax1.set_title('Temperature', fontsize=12, pad=10)
-            ax1.set_ylabel('Temperature (°C)', fontsize=10)
-            ax1.grid(True, linestyle='--', alpha=0.7)
-            ax1.set_facecolor('#f9f9f9')
-            
-            # Add threshold lines and annotations
-            ax1.axhline(y=Config.TEMP_HIGH_THRESHOLD, color='orange', linestyle='--', linewidth=1)
-            ax1.axhline(y=Config.TEMP_CRITICAL_THRESHOLD, color='red', linestyle='--', linewidth=1)
-            ax1.axhline(y=Config.TEMP_LOW_THRESHOLD, color='blue', linestyle='--', linewidth=1)
-            
-            ax1.annotate(f'High Threshold ({Config.TEMP_HIGH_THRESHOLD}°C)', 
-                        xy=(timestamps[0], Config.TEMP_HIGH_THRESHOLD),
-                        xytext=(10, 10), textcoords='offset points',
-                        color='orange', fontsize=8)
-            
-            ax1.annotate(f'Critical Threshold ({Config.TEMP_CRITICAL_THRESHOLD}°C)', 
-                        xy=(timestamps[0], Config.TEMP_CRITICAL_THRESHOLD),
-                        xytext=(10, 10), textcoords='offset points',
-                        color='red', fontsize=8)
-            
-            ax1.annotate(f'Low Threshold ({Config.TEMP_LOW_THRESHOLD}°C)', 
-                        xy=(timestamps[0], Config.TEMP_LOW_THRESHOLD),
-                        xytext=(10, -20), textcoords='offset points',
-                        color='blue', fontsize=8)
-            
-            # Humidity plot
-            ax2 = fig.add_subplot(212)
-            ax2.plot(timestamps, hums, 'b-', linewidth=2, marker='o', markersize=4,
-                    markerfacecolor='white', markeredgecolor='blue')
-            ax2.set_title('Humidity', fontsize=12, pad=10)
-            ax2.set_ylabel('Humidity (%)', fontsize=10)
-            ax2.grid(True, linestyle='--', alpha=0.7)
-            ax2.set_facecolor('#f9f9f9')
-            
-            # Add threshold lines and annotations
-            ax2.axhline(y=Config.HUMIDITY_HIGH_THRESHOLD, color='orange', linestyle='--', linewidth=1)
-            ax2.axhline(y=Config.HUMIDITY_CRITICAL_THRESHOLD, color='red', linestyle='--', linewidth=1)
-            ax2.axhline(y=Config.HUMIDITY_LOW_THRESHOLD, color='blue', linestyle='--', linewidth=1)
-            
-            ax2.annotate(f'High Threshold ({Config.HUMIDITY_HIGH_THRESHOLD}%)', 
-                        xy=(timestamps[0], Config.HUMIDITY_HIGH_THRESHOLD),
-                        xytext=(10, 10), textcoords='offset points',
-                        color='orange', fontsize=8)
-            
-            ax2.annotate(f'Critical Threshold ({Config.HUMIDITY_CRITICAL_THRESHOLD}%)', 
-                        xy=(timestamps[0], Config.HUMIDITY_CRITICAL_THRESHOLD),
-                        xytext=(10, 10), textcoords='offset points',
-                        color='red', fontsize=8)
-            
-            ax2.annotate(f'Low Threshold ({Config.HUMIDITY_LOW_THRESHOLD}%)', 
-                        xy=(timestamps[0], Config.HUMIDITY_LOW_THRESHOLD),
-                        xytext=(10, -20), textcoords='offset points',
-                        color='blue', fontsize=8)
-            
-            # Rotate x-axis labels
-            for ax in fig.axes:
-                plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-                ax.tick_params(axis='both', which='major', labelsize=8)
-            
-            fig.tight_layout(rect=[0, 0, 1, 0.96])
-            
-            # Embed in Tkinter
-            canvas = FigureCanvasTkAgg(fig, master=tab)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            self.node_charts[node_id] = chart_data.NodeChart(tab, node_id)
+            self.node_charts[node_id].update(*series)
     
     def show_inbox(self):
         """Show alert messages inbox with improved styling"""
@@ -959,22 +1101,44 @@ class ForestMonitoringApp:
             style='Title.TLabel'
         ).pack(side=tk.LEFT, padx=20)
         
+        self.inbox_frame = ttk.Frame(self.content_frame)
+        self.inbox_frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(self.inbox_frame, text="Loading alerts...").pack()
+        self.load_inbox()
+    
+    def load_inbox(self):
+        """Fetch alerts in the background, then render them in the open inbox"""
+        if self.live_connected:
+            self.render_inbox(self.server.replica.alert_rows())
+        else:
+            self.sync_in_background(self.on_inbox_sync)
+    
+    def on_inbox_sync(self, changes):
         # Try to get alerts from server first, fall back to database
-        alerts = []
-        server_alerts = self.server.get_alerts()
-        
-        if server_alerts and server_alerts.get('status') == 'success':
-            alerts = server_alerts.get('alerts', [])
+        if changes is not None:
+            self.render_inbox(self.server.replica.alert_rows())
         else:
-            # Fall back to database alerts
-            alerts = self.db.get_alerts(unread_only=False)
-
+            self.worker.submit(self.db.get_alerts, False, key='inbox_db',
+                               on_done=lambda alerts: self.render_inbox(alerts, 'database'))
+    
+    def render_inbox(self, alerts, source='server'):
+        """Fill the open inbox with (id, node_id, message, severity, timestamp) rows (Tk thread).
+        
+        source tells whose ids they are ('server' or the local 'database'),
+        which is where marking as read and deleting are sent.
+        """
+        if self.current_view != "inbox" or self.inbox_frame is None:
+            return
+        self.inbox_source = source
+        for widget in self.inbox_frame.winfo_children():
+            widget.destroy()
+        
         if not alerts:
-            ttk.Label(self.content_frame, text="No alerts found").pack()
+            ttk.Label(self.inbox_frame, text="No alerts found").pack()
             return
         
         # Create frame for alerts table
-        table_frame = ttk.Frame(self.content_frame)
+        table_frame = ttk.Frame(self.inbox_frame)
         table_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
         
         # Create treeview widget
@@ -1020,7 +1184,7 @@ class ForestMonitoringApp:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Action buttons at bottom
-        bottom_frame = ttk.Frame(self.content_frame)
+        bottom_frame = ttk.Frame(self.inbox_frame)
         bottom_frame.pack(pady=10)
         
         ttk.Button(
@@ -1037,20 +1201,181 @@ class ForestMonitoringApp:
             command=lambda: self.delete_alerts(tree)
         ).pack(side=tk.LEFT, padx=5)
     
-    def mark_alert_read(self, tree):
-        """Mark selected alerts as read"""
+    def selected_alert_ids(self, tree):
+        """(items, alert ids) of the inbox selection, warns when nothing is selected"""
         selected_items = tree.selection()
         if not selected_items:
             messagebox.showwarning("Warning", "Please select at least one alert")
+        return selected_items, [tree.item(item)['values'][0] for item in selected_items]
+    
+    def mark_alert_read(self, tree):
+        """Mark selected alerts as read, in one request"""
+        selected_items, alert_ids = self.selected_alert_ids(tree)
+        if not selected_items:
+            return
+        mark = self.server.mark_alerts_read if self.inbox_source == 'server' else self.db.mark_alerts_read
+        
+        def done(updated):
+            if updated is None:
+                messagebox.showerror("Error", "Could not mark alerts as read")
+                return
+            for item in selected_items:
+                if tree.exists(item):
+                    tree.item(item, tags=('read',))  # Change tag to remove highlight
+            messagebox.showinfo("Success", f"Marked {len(selected_items)} alerts as read")
+        
+        self.worker.submit(mark, alert_ids, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Could not mark alerts as read: {e}"))
+    
+    def delete_alerts(self, tree):
+        """Delete selected alerts, in one request"""
+        selected_items, alert_ids = self.selected_alert_ids(tree)
+        if not selected_items:
+            return
+        if not messagebox.askyesno("Confirm", f"Delete {len(selected_items)} alerts?"):
             return
+        delete = self.server.delete_alerts if self.inbox_source == 'server' else self.db.delete_alerts
         
-        for item in selected_items:
-            alert_id = tree.item(item)['values'][0]
-            self.db.mark_alert_as_read(alert_id)
-            tree.item(item, tags=('read',))  # Change tag to remove highlight
+        def done(deleted):
+            if deleted is None:
+                messagebox.showerror("Error", "Could not delete alerts")
+                return
+            for item in selected_items:
+                if tree.exists(item):
+                    tree.delete(item)
+            messagebox.showinfo("Success", f"Deleted {deleted} alerts")
+        
+        self.worker.submit(delete, alert_ids, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Could not delete alerts: {e}"))
+    
+    def schedule_data_refresh(self):
+        """Schedule periodic data refresh if logged in"""
+        if hasattr(self, 'current_user') and self.current_user:
+            self.refresh_data()
+            self.root.after(self.data_refresh_interval, self.schedule_data_refresh)
+
+    def sync_in_background(self, on_done):
+        """Delta-sync the server replica, then call on_done(changes) on the Tk thread.
+        
+        The requests run on a worker thread; the replica is only modified on
+        the Tk thread. changes is (new_readings, new_alerts), or None when the
+        server is unreachable.
+        """
+        replica = self.server.replica
+        self.worker.submit(
+            self.server.fetch_changes, replica.epoch, replica.reading_seq, replica.alert_seq,
+            on_done=lambda pages: on_done(self.server.apply_changes(pages)),
+            key='sync'
+        )
+    
+    def on_refresh_sync(self, changes):
+        """Redraw the server-backed views when a background sync brought something new"""
+        if changes is not None and not any(changes):
+            return
+        if self.current_view == "data_table":
+            self.on_table_sync(changes, self.on_table_rows)
+        elif self.current_view == "inbox":
+            self.on_inbox_sync(changes)
+    
+    def start_live_updates(self):
+        """Start consuming server-pushed events (readings and alerts)"""
+        if self.live_thread and self.live_thread.is_alive() and not self.live_stop.is_set():
+            return
+        # A stream told to stop may still be blocked reading its connection:
+        # it keeps its own stop event and its late events are dropped
+        self.live_stop = threading.Event()
+        self.live_thread = threading.Thread(target=self.run_live_stream, args=(self.live_stop,), daemon=True)
+        self.live_thread.start()
+        self.poll_live_events(self.live_stop)
+    
+    def stop_live_updates(self):
+        """Stop the push channel; views fall back to polling"""
+        self.live_stop.set()
+        self.live_connected = False
+    
+    def run_live_stream(self, stop_event):
+        """Background thread: keep the event stream open, reconnecting with backoff"""
+        delay = Config.STREAM_RETRY_MS / 1000
+        handle_event = lambda event, data: self.queue_live_event(event, data, stop_event)
+        while not stop_event.is_set():
+            try:
+                self.server.stream_events(handle_event, stop_event)
+                delay = Config.STREAM_RETRY_MS / 1000
+            except (requests.RequestException, ValueError) as e:
+                print(f"Live updates unavailable: {e}")
+                delay = min(delay * 2, 60)
+            handle_event('disconnected', None)
+            stop_event.wait(delay)
+    
+    def queue_live_event(self, event, data, stop_event):
+        """Hand an event to the Tk thread; a full queue means the UI fell behind"""
+        if stop_event.is_set():
+            return  # From a stream that was stopped
+        try:
+            self.live_events.put_nowait((event, data))
+        except queue.Full:
+            self.live_overflow = True
+    
+    def poll_live_events(self, stop_event):
+        """Apply queued push events to the replica on the Tk thread, until stop_event is set"""
+        changed = False
+        resync = self.live_overflow
+        self.live_overflow = False
         
-        messagebox.showinfo("Success", f"Marked {len(selected_items)} alerts as read")
+        while True:
+            try:
+                event, data = self.live_events.get_nowait()
+            except queue.Empty:
+                break
+            if event in ('hello', 'resync'):
+                self.live_connected = True
+                resync = resync or event == 'resync' or self.server.replica.is_behind(data)
+            elif event == 'disconnected':
+                self.live_connected = False
+            elif event == 'reading':
+                if data['seq'] > self.server.replica.reading_seq + 1:
+                    resync = True  # Gap in the sequence: fetch what was missed
+                else:
+                    changed = self.server.replica.add_reading(data) or changed
+            elif event == 'alert':
+                if data['seq'] > self.server.replica.alert_seq + 1:
+                    resync = True
+                else:
+                    changed = self.server.replica.add_alert(data) or changed
+        
+        if resync:
+            self.sync_in_background(self.on_refresh_sync)
+        
+        if changed and self.current_view == "data_table":
+            self.on_table_rows(self.append_replica_rows())
+        elif changed and self.current_view == "inbox":
+            self.render_inbox(self.server.replica.alert_rows())
+        
+        if self.current_user and not stop_event.is_set():
+            self.root.after(Config.LIVE_EVENT_POLL_MS, self.poll_live_events, stop_event)
     
+    def refresh_data(self):
+        """Refresh the current view's data"""
+        if self.current_view in ("data_table", "inbox"):
+            if self.live_connected:
+                # Pushed events keep these views current, no need to poll
+                return
+            # Server-backed views: only redraw when the delta sync brings something new
+            self.sync_in_background(self.on_refresh_sync)
+            return
+        
+        if self.current_view == "dashboard":
+            self.show_dashboard()
+        elif self.current_view == "data_charts":
+            if self.charts_frame is not None:
+                self.update_data_charts()
+            else:
+                self.show_data_charts()
+        elif self.current_view == "map":
+            self.show_map()
+        elif self.current_view == "csv_tools":
+            self.show_csv_tools()
+
 def show_map(self):
     """Show map placeholder with improved styling"""
     self.clear_content()
@@ -1083,27 +1408,6 @@ def show_map(self):
         justify=tk.CENTER
     ).pack(expand=True)
 
-    def schedule_data_refresh(self):
-        """Schedule periodic data refresh if logged in"""
-        if hasattr(self, 'current_user') and self.current_user:
-            self.refresh_data()
-            self.root.after(self.data_refresh_interval, self.schedule_data_refresh)
-
-    def refresh_data(self):
-        """Refresh the current view's data"""
-        if self.current_view == "dashboard":
-            self.show_dashboard()
-        elif self.current_view == "data_table":
-            self.show_data_table()
-        elif self.current_view == "data_charts":
-            self.show_data_charts()
-        elif self.current_view == "inbox":
-            self.show_inbox()
-        elif self.current_view == "map":
-            self.show_map()
-        elif self.current_view == "csv_tools":
-            self.show_csv_tools()
-
 if __name__ == "__main__":
     root = tk.Tk()
     
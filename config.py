@@ -1,3 +1,6 @@
+import os
+
+
 class Config:
     # Application settings
     APP_NAME = "Forest Monitoring System"
@@ -5,6 +8,14 @@ class Config:
     
     # Database settings
     DATABASE_FILE = "db.sqlite"
+    DATABASE_TIMEOUT = 30.0           # Seconds to wait on a locked database
+    DATABASE_PRAGMAS = [              # Applied to every pooled connection
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "temp_store=MEMORY",
+        "cache_size=-16000",          # 16 MB page cache
+        "foreign_keys=ON",
+    ]
     
     # Alert thresholds - Temperature (°C)
     TEMP_LOW_THRESHOLD = 5.0          # Too cold for forest health
@@ -16,6 +27,59 @@ class Config:
     HUMIDITY_HIGH_THRESHOLD = 80.0    # High humidity warning
     HUMIDITY_CRITICAL_THRESHOLD = 20.0 # Critical dry level 
     
+    # Readings scanned per transaction by the threshold alert sweep
+    ALERT_SCAN_BATCH_SIZE = 10000
+    
+    # Server alert engine: one alert per incident (node and metric out of range)
+    TEMP_HYSTERESIS = 1.0             # °C back inside a threshold before an incident ends
+    HUMIDITY_HYSTERESIS = 3.0         # % back inside a threshold before an incident ends
+    ALERT_COOLDOWN = 300              # Seconds after an incident ends during which it reopens
+    ALERT_UPDATE_INTERVAL = 60        # Seconds between re-published updates of an ongoing incident
+    
+    # Minute/hour/day rollups
+    ROLLUP_BATCH_SIZE = 50000         # Readings folded into the rollups per transaction
+    ROLLUP_FOLD_ROWS = 500            # Single-row inserts pending before they are folded in...
+    ROLLUP_FOLD_INTERVAL = 10.0       # ...or seconds since the last fold, checked on insert
+    ROLLUP_MAX_POINTS = 2000          # Points per node before a coarser resolution is used
+    
+    # Server in-memory store limits
+    NODE_BUFFER_CAPACITY = 17280      # Readings kept per node (24 h at one every 5 s)
+    ALERT_BUFFER_CAPACITY = 5000      # Most recent alerts kept
+    GET_DATA_MAX_LIMIT = 10000        # Largest page served by /api/get_data
+    
+    # Server push (server-sent events) settings
+    SERVER_THREADS = 16               # Waitress worker threads
+    STREAM_MAX_SUBSCRIBERS = 8        # Concurrent /api/stream clients
+    STREAM_QUEUE_SIZE = 1000          # Events buffered per client before it must resync
+    STREAM_HEARTBEAT_SECONDS = 15     # Keep-alive comment interval on idle streams
+    STREAM_RETRY_MS = 2000            # Reconnect delay suggested to clients
+    LIVE_EVENT_POLL_MS = 200          # How often the desktop client applies pushed events
+    GZIP_MIN_SIZE = 1024              # Smallest response body (bytes) worth compressing
+    GZIP_LEVEL = 6                    # zlib compression level for responses
+    
+    # Desktop client background work
+    REQUEST_TIMEOUT = (3.05, 10)      # Connect and read timeouts (seconds) for server requests
+    REQUEST_RETRIES = 3               # Retries of failed GET requests (connection errors, 502/503/504)
+    REQUEST_BACKOFF = 0.5             # Retry delays grow as 0.5 s, 1 s, 2 s...
+    WORKER_THREADS = 4                # Threads running network, file and database work
+    WORKER_POLL_MS = 50               # How often finished background work is applied to the UI
+    
+    # Desktop charts
+    CHART_MAX_POINTS = 1200           # Points per line after downsampling (about the plot width in pixels)
+    CHART_MARKER_LIMIT = 200          # Draw point markers only up to this many points
+    
+    # Write-behind persistence (server)
+    STORAGE_FORMAT = "segment"        # "segment" (encrypted binary blocks) or "csv"
+    WRITER_FLUSH_SIZE = 500           # Flush once this many readings are pending
+    WRITER_FLUSH_INTERVAL = 1.0       # ...or this many seconds after the first one
+    WRITER_QUEUE_SIZE = 10000         # Queued requests before ingest is pushed back
+    WRITER_SUBMIT_TIMEOUT = 2.0       # Seconds a request waits for queue space
+    WRITER_MAX_ATTEMPTS = 5           # Failed flushes of a node's readings before they are dropped
+    
+    # Encryption keys
+    KEY_FILE = "key.txt"              # Legacy single key, kept equal to the primary key
+    KEYRING_FILE = "keyring.json"     # Versioned keys, newest version encrypts
+    
     # UI Colors
     PRIMARY_COLOR = "#2c3e50"         # Dark blue - for headers/navigation
     SECONDARY_COLOR = "#3498db"       # Blue - for buttons/accents
@@ -29,6 +93,17 @@ class Config:
     BODY_FONT = ("Arial", 12)                # Regular text
     SMALL_FONT = ("Arial", 10)               # Captions, small text
     
+    # CSV import settings
+    IMPORT_CHUNK_SIZE = 5000          # Rows inserted per transaction
+    IMPORT_MAX_REPORTED_ERRORS = 10   # Rejected rows printed individually
+    
+    # Incremental file reading (byte-offset checkpoints per file)
+    TAIL_CHUNK_BYTES = 1 << 20        # Bytes read from a file at a time
+    TAIL_SETTLE_SECONDS = 2           # Unmodified for this long, a last line without newline is complete
+    CHECKPOINT_DIR = "checkpoints"    # Read positions, one JSON file per consumer
+    IMPORT_CHECKPOINT_FILE = os.path.join(CHECKPOINT_DIR, "imports.json")
+    ALERT_CHECKPOINT_FILE = os.path.join(CHECKPOINT_DIR, "alerts.json")
+    
     # Path settings
     DATA_DIR = "data"                 # Directory for CSV files
     IMAGE_DIR = "images"              # Directory for application images
\ No newline at end of file
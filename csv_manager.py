@@ -1,46 +1,81 @@
 import csv
 import os
 import sqlite3
+import time
 from datetime import datetime
 from database import Database
+from config import Config
+from tail_reader import TailReader
 
 class CSVManager:
     def __init__(self):
         self.data_dir = "data"
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
+        self.reader = TailReader(Config.IMPORT_CHECKPOINT_FILE)  # Bytes of each file already imported
     
     def get_csv_files(self):
         """Get list of CSV files in data directory"""
         return [f for f in os.listdir(self.data_dir) if f.endswith('.csv')]
     
-    def import_csv(self, filepath):
-        """Import CSV data to database"""
+    def parse_sensor_row(self, row):
+        """Convert a CSV dict row to a (node_id, temperature, humidity, timestamp) tuple"""
+        return (
+            int(row.get('node_id') or 1),
+            float(row['temperature']),
+            float(row['humidity']),
+            row.get('timestamp') or None
+        )
+    
+    def iter_csv_chunks(self, filepath, chunk_size):
+        """Stream parsed rows not imported yet from a CSV file in chunks, yields (rows, rejected_count)"""
+        rejected = 0
+        # A one-shot import: the file is complete, its last line may lack a newline
+        for first_line, rows in self.reader.iter_rows(filepath, max_lines=chunk_size, final=True):
+            chunk = []
+            for line_number, row in enumerate(rows, start=first_line):
+                try:
+                    chunk.append(self.parse_sensor_row(row))
+                except (ValueError, KeyError, TypeError) as e:
+                    rejected += 1
+                    if rejected <= Config.IMPORT_MAX_REPORTED_ERRORS:
+                        print(f"Skipping line {line_number} due to error: {e}")
+            yield chunk, rejected
+    
+    def import_csv(self, filepath, chunk_size=None):
+        """Bulk import the rows of a CSV file not imported yet, one transaction per chunk of rows.
+        
+        Importing a file again (e.g. after the logger appended to it) only adds
+        the new rows; a truncated or replaced file is imported from the start.
+        """
         try:
             db = Database()
+            chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
             imported_rows = 0
+            rejected_rows = 0
+            started = time.perf_counter()
+            
+            for rows, rejected_rows in self.iter_csv_chunks(filepath, chunk_size):
+                if rows:
+                    imported_rows += db.add_sensor_data_bulk(rows)
+                # Persists the position of the chunks before this one, all committed
+                self.reader.save()
             
-            with open(filepath, 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        db.add_sensor_data(
-                            node_id=int(row.get('node_id', 1)),
-                            temperature=float(row['temperature']),
-                            humidity=float(row['humidity'])
-                        )
-                        imported_rows += 1
-                    except (ValueError, KeyError) as e:
-                        print(f"Skipping row due to error: {e}")
-                        continue
+            elapsed = time.perf_counter() - started
+            rate = imported_rows / elapsed if elapsed > 0 else float(imported_rows)
             
             # Move imported file to data directory
             filename = os.path.basename(filepath)
             new_path = os.path.join(self.data_dir, filename)
             if not os.path.exists(new_path):
                 os.rename(filepath, new_path)
+                self.reader.move(filepath, new_path)
+            self.reader.save()
             
-            return True, f"Successfully imported {imported_rows} rows from {filename}"
+            return True, (
+                f"Successfully imported {imported_rows} rows from {filename} "
+                f"({rejected_rows} rejected, {rate:,.0f} rows/s)"
+            )
         
         except Exception as e:
             return False, f"Error importing CSV: {str(e)}"
@@ -74,6 +109,8 @@ class CSVManager:
             filepath = os.path.join(self.data_dir, filename)
             if os.path.exists(filepath):
                 os.remove(filepath)
+                self.reader.forget(filepath)
+                self.reader.save()
                 return True, f"Deleted {filename}"
             return False, f"File not found: {filename}"
         except Exception as e:
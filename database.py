@@ -1,17 +1,154 @@
 import sqlite3
+import threading
+import time
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from datetime import datetime
 from config import Config
+import thresholds
+
+def add_alert_metric_column(conn):
+    """ALTER TABLE has no IF NOT EXISTS: only add alerts.metric when missing"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(alerts)")]
+    if 'metric' not in columns:
+        conn.execute("ALTER TABLE alerts ADD COLUMN metric TEXT NOT NULL DEFAULT ''")
+
+# Schema migrations applied in order on top of the base tables created in
+# init_db. PRAGMA user_version records how many have run, so each one runs
+# once per database file and reopening an up-to-date file is a no-op. A step
+# is an SQL statement or a function called with the connection.
+MIGRATIONS = [
+    # 1: time-series indexes
+    [
+        "CREATE INDEX IF NOT EXISTS idx_sensor_data_node_ts ON sensor_data (node_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_sensor_data_ts ON sensor_data (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts (timestamp)",
+        "ANALYZE",
+    ],
+    # 2: persisted high-water marks for incremental jobs, seeded so the alert
+    # sweep resumes after the readings already covered by existing alerts
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        ''',
+        '''
+        INSERT OR IGNORE INTO sync_state (name, value)
+        SELECT 'alerts_last_id', COALESCE(MAX(id), 0)
+        FROM sensor_data
+        WHERE timestamp <= (SELECT MAX(timestamp) FROM alerts)
+        ''',
+    ],
+    # 3: per-node rollups (count, min, max, sum) per minute, hour and day,
+    # built from sensor_data by update_rollups starting at id 0
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS sensor_rollups (
+            resolution TEXT NOT NULL,
+            node_id INTEGER NOT NULL,
+            bucket TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            temperature_min REAL NOT NULL,
+            temperature_max REAL NOT NULL,
+            temperature_sum REAL NOT NULL,
+            humidity_min REAL NOT NULL,
+            humidity_max REAL NOT NULL,
+            humidity_sum REAL NOT NULL,
+            PRIMARY KEY (resolution, node_id, bucket)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_sensor_rollups_bucket ON sensor_rollups (resolution, bucket)",
+        "INSERT OR IGNORE INTO sync_state (name, value) VALUES ('rollups_last_id', 0)",
+    ],
+    # 4: alerts keyed by (node_id, reading timestamp, metric, severity). The
+    # metric of existing alerts is recovered from their message, duplicates
+    # are merged into the oldest one (read if any of them was) and a unique
+    # index makes later inserts of the same alert no-ops
+    [
+        add_alert_metric_column,
+        '''
+        UPDATE alerts SET metric = CASE
+            WHEN message LIKE '%temperature%' THEN 'temperature'
+            WHEN message LIKE '%humidity%' THEN 'humidity'
+            ELSE ''
+        END
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_alerts_key_tmp ON alerts (node_id, timestamp, metric, severity)",
+        '''
+        UPDATE alerts SET is_read = 1
+        WHERE is_read = 0 AND EXISTS (
+            SELECT 1 FROM alerts AS other
+            WHERE other.node_id = alerts.node_id AND other.timestamp = alerts.timestamp
+              AND other.metric = alerts.metric AND other.severity = alerts.severity
+              AND other.is_read = 1
+        )
+        ''',
+        '''
+        DELETE FROM alerts
+        WHERE EXISTS (
+            SELECT 1 FROM alerts AS other
+            WHERE other.node_id = alerts.node_id AND other.timestamp = alerts.timestamp
+              AND other.metric = alerts.metric AND other.severity = alerts.severity
+              AND other.id < alerts.id
+        )
+        ''',
+        "DROP INDEX IF EXISTS idx_alerts_key_tmp",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_key ON alerts (node_id, timestamp, metric, severity)",
+    ],
+]
+
+# Rollup resolutions, finest first: strftime bucket format and bucket width in seconds
+ROLLUP_RESOLUTIONS = [
+    ('minute', '%Y-%m-%d %H:%M:00', 60),
+    ('hour', '%Y-%m-%d %H:00:00', 3600),
+    ('day', '%Y-%m-%d 00:00:00', 86400),
+]
 
 class Database:
-    def __init__(self):
-        self.db_file = 'db.sqlite'
-        self.init_db()
+    # One persistent connection per thread and database file
+    _local = threading.local()
+    # Database files whose schema has already been initialized in this process
+    _initialized = set()
+    _init_lock = threading.Lock()
+    # Database file -> [single-row inserts not folded into the rollups yet, monotonic time of the last fold]
+    _rollups_pending = {}
+    _rollups_lock = threading.Lock()
+
+    def __init__(self, db_file=None):
+        self.db_file = os.path.abspath(db_file or Config.DATABASE_FILE)
+        self.ensure_schema()
+    
+    def ensure_schema(self):
+        """Run init_db once per process and database file"""
+        if self.db_file in Database._initialized:
+            return
+        with Database._init_lock:
+            if self.db_file not in Database._initialized:
+                self.init_db()
+                Database._initialized.add(self.db_file)
     
     def get_connection(self):
-        """Get a database connection"""
-        return sqlite3.connect(self.db_file)
+        """Get the calling thread's pooled database connection"""
+        connections = getattr(Database._local, 'connections', None)
+        if connections is None:
+            connections = Database._local.connections = {}
+        
+        conn = connections.get(self.db_file)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=Config.DATABASE_TIMEOUT)
+            for pragma in Config.DATABASE_PRAGMAS:
+                conn.execute(f"PRAGMA {pragma}")
+            connections[self.db_file] = conn
+        return conn
+    
+    def close_connection(self):
+        """Close the calling thread's connection (reopened on next use)"""
+        connections = getattr(Database._local, 'connections', {})
+        conn = connections.pop(self.db_file, None)
+        if conn is not None:
+            conn.close()
     
     def execute_query(self, query, params=(), commit=False):
         """Execute a single query"""
@@ -22,6 +159,15 @@ class Database:
                 conn.commit()
             return cursor
     
+    def execute_many(self, query, rows, commit=False):
+        """Execute a query once per parameter row in a single transaction"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(query, rows)
+            if commit:
+                conn.commit()
+            return cursor
+    
     def fetch_all(self, query, params=()):
         """Execute query and fetch all results"""
         cursor = self.execute_query(query, params)
@@ -67,6 +213,8 @@ class Database:
     )
 ''', commit=True)
         
+        self.migrate()
+        
         # Create admin user if not exists
         if not self.fetch_one("SELECT id FROM users WHERE username='admin'"):
             hashed_pw = generate_password_hash('admin123')
@@ -76,6 +224,24 @@ class Database:
                 commit=True
             )
     
+    def migrate(self):
+        """Apply pending schema migrations, returns the resulting schema version"""
+        version = self.fetch_one("PRAGMA user_version")[0]
+        conn = self.get_connection()
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            # Explicit transaction: sqlite3 would otherwise autocommit each DDL
+            # statement, leaving a failed migration half-applied
+            with conn:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+            version = number
+        return version
+    
     def authenticate_user(self, username, password):
         """Authenticate user credentials"""
         user = self.fetch_one(
@@ -101,9 +267,41 @@ class Database:
             (node_id, temperature, humidity),
             commit=True
         )
+        self.update_rollups_if_due()
+    
+    def add_sensor_data_bulk(self, rows):
+        """Add many (node_id, temperature, humidity, timestamp) rows in one transaction.
+        
+        A timestamp of None falls back to the current time, like add_sensor_data.
+        Returns the number of inserted rows.
+        """
+        cursor = self.execute_many(
+            '''
+            INSERT INTO sensor_data (node_id, temperature, humidity, timestamp)
+            VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''',
+            rows,
+            commit=True
+        )
+        inserted = cursor.rowcount
+        self.update_rollups()
+        return inserted
     
-    def get_sensor_data(self, limit=100):
-        """Get recent sensor data"""
+    def get_sensor_data(self, limit=100, node_id=None):
+        """Get recent sensor data, optionally for a single node (limit=None for all rows)"""
+        if limit is None:
+            limit = -1
+        if node_id is not None:
+            return self.fetch_all(
+                '''
+                SELECT node_id, temperature, humidity, timestamp
+                FROM sensor_data
+                WHERE node_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+                ''',
+                (node_id, limit)
+            )
         return self.fetch_all(
             '''
             SELECT node_id, temperature, humidity, timestamp
@@ -114,19 +312,36 @@ class Database:
             (limit,)
         )
     
-    def add_alert(self, node_id, message, severity, timestamp=None):
-        """Add a new alert to the database"""
+    def add_alert(self, node_id, message, severity, timestamp=None, metric=''):
+        """Add a new alert to the database unless the same alert exists, returns True if added"""
         if timestamp is None:
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-        self.execute_query(
+        cursor = self.execute_query(
+            '''
+            INSERT OR IGNORE INTO alerts (node_id, message, severity, timestamp, metric)
+            VALUES (?, ?, ?, ?, ?)
+            ''',
+            (node_id, message, severity, timestamp, metric),
+            commit=True
+        )
+        return cursor.rowcount > 0
+    
+    def add_alerts_bulk(self, alerts):
+        """Add many (node_id, message, severity, timestamp, metric) alerts in one transaction.
+        
+        Alerts already stored (same node, reading timestamp, metric and
+        severity) are skipped. Returns the number of alerts added.
+        """
+        cursor = self.execute_many(
             '''
-            INSERT INTO alerts (node_id, message, severity, timestamp)
-            VALUES (?, ?, ?, ?)
+            INSERT OR IGNORE INTO alerts (node_id, message, severity, timestamp, metric)
+            VALUES (?, ?, ?, ?, ?)
             ''',
-            (node_id, message, severity, timestamp),
+            alerts,
             commit=True
         )
+        return cursor.rowcount
     
     def get_alerts(self, unread_only=False):
         """Get alert messages"""
@@ -159,6 +374,19 @@ class Database:
             commit=True
         )
     
+    def mark_alerts_read(self, alert_ids):
+        """Mark several alerts as read in one transaction, returns how many were unread"""
+        cursor = self.execute_many(
+            '''
+            UPDATE alerts
+            SET is_read = 1
+            WHERE id = ? AND is_read = 0
+            ''',
+            [(alert_id,) for alert_id in alert_ids],
+            commit=True
+        )
+        return cursor.rowcount
+    
     def delete_alert(self, alert_id):
         """Delete an alert from database"""
         self.execute_query(
@@ -170,62 +398,215 @@ class Database:
             commit=True
         )
     
-    def check_thresholds_and_create_alerts(self):
-        """Check sensor data against thresholds and create alerts"""
-        # Get recent data that hasn't been alerted yet
-        recent_data = self.fetch_all(
+    def delete_alerts(self, alert_ids):
+        """Delete several alerts in one transaction, returns how many existed"""
+        cursor = self.execute_many(
             '''
-            SELECT node_id, temperature, humidity, timestamp
-            FROM sensor_data
-            WHERE timestamp > (SELECT MAX(timestamp) FROM alerts) OR 
-                  (SELECT COUNT(*) FROM alerts) = 0
-            ORDER BY timestamp DESC
+            DELETE FROM alerts
+            WHERE id = ?
+            ''',
+            [(alert_id,) for alert_id in alert_ids],
+            commit=True
+        )
+        return cursor.rowcount
+    
+    def get_watermark(self, name):
+        """Get a persisted high-water mark (0 if never set)"""
+        row = self.fetch_one("SELECT value FROM sync_state WHERE name = ?", (name,))
+        return row[0] if row else 0
+    
+    def set_watermark(self, name, value):
+        """Persist a high-water mark"""
+        self.execute_query(
             '''
+            INSERT INTO sync_state (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+            ''',
+            (name, value),
+            commit=True
         )
+    
+    def check_thresholds_and_create_alerts(self):
+        """Check readings added since the last run against thresholds and create alerts.
         
-        for node_id, temp, hum, timestamp in recent_data:
-            # Check temperature thresholds
-            if temp >= Config.TEMP_CRITICAL_THRESHOLD:
-                self.add_alert(
-                    node_id,
-                    f"Node {node_id}: Critical high temperature ({temp}°C)",
-                    "critical",
-                    timestamp
-                )
-            elif temp >= Config.TEMP_HIGH_THRESHOLD:
-                self.add_alert(
-                    node_id,
-                    f"Node {node_id}: High temperature ({temp}°C)",
-                    "high",
-                    timestamp
-                )
-            elif temp <= Config.TEMP_LOW_THRESHOLD:
-                self.add_alert(
-                    node_id,
-                    f"Node {node_id}: Low temperature ({temp}°C)",
-                    "high",
-                    timestamp
-                )
+        The last processed sensor_data.id is persisted as the 'alerts_last_id'
+        watermark, so each run only scans new rows. Alerts of each scanned batch
+        are inserted in the same transaction that advances the watermark.
+        Returns the number of alerts created.
+        """
+        last_id = self.get_watermark('alerts_last_id')
+        created = 0
+        
+        while True:
+            rows = self.fetch_all(
+                '''
+                SELECT id, node_id, temperature, humidity, timestamp
+                FROM sensor_data
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+                ''',
+                (last_id, Config.ALERT_SCAN_BATCH_SIZE)
+            )
+            if not rows:
+                break
+            
+            _, node_ids, temperatures, humidities, timestamps = zip(*rows)
+            alerts = thresholds.alerts_for(node_ids, temperatures, humidities, timestamps)
             
-            # Check humidity thresholds
-            if hum >= Config.HUMIDITY_CRITICAL_THRESHOLD:
-                self.add_alert(
-                    node_id,
-                    f"Node {node_id}: Critical high humidity ({hum}%)",
-                    "critical",
-                    timestamp
+            last_id = rows[-1][0]
+            with self.get_connection() as conn:
+                cursor = conn.executemany(
+                    '''
+                    INSERT OR IGNORE INTO alerts (node_id, message, severity, timestamp, metric)
+                    VALUES (?, ?, ?, ?, ?)
+                    ''',
+                    alerts
                 )
-            elif hum >= Config.HUMIDITY_HIGH_THRESHOLD:
-                self.add_alert(
-                    node_id,
-                    f"Node {node_id}: High humidity ({hum}%)",
-                    "high",
-                    timestamp
+                conn.execute(
+                    '''
+                    INSERT INTO sync_state (name, value) VALUES ('alerts_last_id', ?)
+                    ON CONFLICT(name) DO UPDATE SET value = excluded.value
+                    ''',
+                    (last_id,)
                 )
-            elif hum <= Config.HUMIDITY_LOW_THRESHOLD:
-                self.add_alert(
-                    node_id,
-                    f"Node {node_id}: Low humidity ({hum}%)",
-                    "high",
-                    timestamp
-                )
\ No newline at end of file
+            created += max(cursor.rowcount, 0)
+        
+        return created
+    
+    def update_rollups(self):
+        """Fold readings added since the last run into the minute, hour and day rollups.
+        
+        Each batch of new sensor_data ids is aggregated with GROUP BY and
+        merged into the existing buckets with an upsert, in the same transaction
+        that advances the 'rollups_last_id' watermark. Returns the number of
+        readings folded in.
+        """
+        conn = self.get_connection()
+        folded = 0
+        while True:
+            with conn:
+                # Take the write lock first so concurrent runs never fold a batch twice
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT value FROM sync_state WHERE name = 'rollups_last_id'").fetchone()
+                last_id = row[0] if row else 0
+                upper_id = conn.execute(
+                    "SELECT MAX(id) FROM (SELECT id FROM sensor_data WHERE id > ? ORDER BY id LIMIT ?)",
+                    (last_id, Config.ROLLUP_BATCH_SIZE)
+                ).fetchone()[0]
+                if upper_id is None:
+                    return folded
+                
+                for resolution, bucket_format, _ in ROLLUP_RESOLUTIONS:
+                    conn.execute(
+                        '''
+                        INSERT INTO sensor_rollups (
+                            resolution, node_id, bucket, count,
+                            temperature_min, temperature_max, temperature_sum,
+                            humidity_min, humidity_max, humidity_sum
+                        )
+                        SELECT ?, node_id, strftime(?, timestamp) AS bucket, COUNT(*),
+                               MIN(temperature), MAX(temperature), SUM(temperature),
+                               MIN(humidity), MAX(humidity), SUM(humidity)
+                        FROM sensor_data
+                        WHERE id > ? AND id <= ? AND bucket IS NOT NULL
+                        GROUP BY node_id, bucket
+                        ON CONFLICT(resolution, node_id, bucket) DO UPDATE SET
+                            count = count + excluded.count,
+                            temperature_min = MIN(temperature_min, excluded.temperature_min),
+                            temperature_max = MAX(temperature_max, excluded.temperature_max),
+                            temperature_sum = temperature_sum + excluded.temperature_sum,
+                            humidity_min = MIN(humidity_min, excluded.humidity_min),
+                            humidity_max = MAX(humidity_max, excluded.humidity_max),
+                            humidity_sum = humidity_sum + excluded.humidity_sum
+                        ''',
+                        (resolution, bucket_format, last_id, upper_id)
+                    )
+                folded += conn.execute(
+                    "SELECT COUNT(*) FROM sensor_data WHERE id > ? AND id <= ?", (last_id, upper_id)
+                ).fetchone()[0]
+                conn.execute(
+                    "UPDATE sync_state SET value = ? WHERE name = 'rollups_last_id'", (upper_id,)
+                )
+    
+    def update_rollups_if_due(self):
+        """Count one single-row insert, folding pending ones into the rollups in batches.
+
+        Folds once ROLLUP_FOLD_ROWS inserts are pending or ROLLUP_FOLD_INTERVAL
+        seconds after the last fold, so each reading does not pay for its own
+        rollup transaction; readers call update_rollups first. Returns the
+        number of readings folded in.
+        """
+        with Database._rollups_lock:
+            pending = Database._rollups_pending.setdefault(self.db_file, [0, time.monotonic()])
+            pending[0] += 1
+            if pending[0] < Config.ROLLUP_FOLD_ROWS and time.monotonic() - pending[1] < Config.ROLLUP_FOLD_INTERVAL:
+                return 0
+            pending[:] = [0, time.monotonic()]
+        return self.update_rollups()
+    
+    def pick_resolution(self, start, end, node_id=None, max_points=None):
+        """Finest resolution ('raw', 'minute', 'hour' or 'day') giving at most max_points per node"""
+        max_points = max_points or Config.ROLLUP_MAX_POINTS
+        window = (end - start).total_seconds()
+        if window / ROLLUP_RESOLUTIONS[0][2] <= max_points:
+            query = "SELECT COUNT(*) FROM sensor_data WHERE timestamp >= ? AND timestamp <= ?"
+            params = [start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')]
+            if node_id is not None:
+                query += " AND node_id = ?"
+                params.append(node_id)
+                nodes = 1
+            else:
+                nodes = max(1, self.fetch_one("SELECT COUNT(DISTINCT node_id) FROM sensor_rollups WHERE resolution = 'day'")[0])
+            if self.fetch_one(query, params)[0] <= max_points * nodes:
+                return 'raw'
+        for resolution, _, width in ROLLUP_RESOLUTIONS:
+            if window / width <= max_points:
+                return resolution
+        return ROLLUP_RESOLUTIONS[-1][0]
+    
+    def get_sensor_series(self, start=None, end=None, node_id=None, max_points=None, resolution=None):
+        """Readings or rollups over a time window at a resolution fitting max_points.
+        
+        Returns (resolution, rows) with rows of (node_id, timestamp, count,
+        temperature_min, temperature_max, temperature_mean, humidity_min,
+        humidity_max, humidity_mean) ordered by node then time. Raw readings
+        have a count of 1 and min = max = mean. The window defaults to the
+        whole history.
+        """
+        self.update_rollups()  # Fold readings inserted since the last batch
+        if start is None or end is None:
+            first, last = self.fetch_one("SELECT MIN(bucket), MAX(bucket) FROM sensor_rollups WHERE resolution = 'day'")
+            if first is None:
+                return 'raw', []
+            start = start or datetime.strptime(first, '%Y-%m-%d %H:%M:%S')
+            end = end or datetime.strptime(last, '%Y-%m-%d %H:%M:%S').replace(hour=23, minute=59, second=59)
+        resolution = resolution or self.pick_resolution(start, end, node_id, max_points)
+        node_filter = "" if node_id is None else " AND node_id = ?"
+        node_params = [] if node_id is None else [node_id]
+        
+        if resolution == 'raw':
+            rows = self.fetch_all(
+                f'''
+                SELECT node_id, timestamp, 1, temperature, temperature, temperature, humidity, humidity, humidity
+                FROM sensor_data
+                WHERE timestamp >= ? AND timestamp <= ?{node_filter}
+                ORDER BY node_id, timestamp
+                ''',
+                [start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')] + node_params
+            )
+            return resolution, rows
+        
+        bucket_format = next(fmt for name, fmt, _ in ROLLUP_RESOLUTIONS if name == resolution)
+        rows = self.fetch_all(
+            f'''
+            SELECT node_id, bucket, count,
+                   temperature_min, temperature_max, temperature_sum / count,
+                   humidity_min, humidity_max, humidity_sum / count
+            FROM sensor_rollups
+            WHERE resolution = ? AND bucket >= ? AND bucket <= ?{node_filter}
+            ORDER BY node_id, bucket
+            ''',
+            [resolution, start.strftime(bucket_format), end.strftime('%Y-%m-%d %H:%M:%S')] + node_params
+        )
+        return resolution, rows
@@ -1,25 +1,275 @@
+"""Decrypt node data files in parallel and stream the readings out.
+
+Handles node CSVs mixing plaintext rows (node_id,temperature,humidity,timestamp)
+with encrypted rows (node_id,data_encrypted,timestamp where the token starts
+with gAAAAA), as well as encrypted segment files (.seg). Files are split into
+chunks that worker processes decrypt while the main process writes the
+results, in file order, to one of:
+
+    csv       one CSV (node_id,temperature,humidity,timestamp), stdout by default
+    columnar  a directory of raw column files (numpy-readable) plus schema.json
+    sqlite    the sensor_data table of a SQLite database
+
+Usage:
+    python decrypt_csv.py [files ...] [--data-dir data] [--format csv]
+                          [--output PATH] [--workers N]
+"""
+import argparse
 import csv
-from cryptography.fernet import Fernet
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from cryptography.fernet import Fernet, MultiFernet
+
+from key_ring import KeyRing
+import segments
+from timestamps import to_datetime64
+
+CHUNK_BYTES = 4 * 1024 * 1024
+NODE_FILE_PATTERNS = ('node_*_data.csv', 'node_*_data' + segments.SEGMENT_EXTENSION)
+
+_worker_fernet = None
+
+
+def load_keys():
+    """Key material handed to the worker processes, every key-ring version, primary first"""
+    return KeyRing().keys()
+
+
+def make_fernet(keys):
+    fernets = [Fernet(key) for key in keys]
+    return fernets[0] if len(fernets) == 1 else MultiFernet(fernets)
+
 
-# Charger la clé Fernet
-with open("key.txt", "rb") as f:
-    fernet = Fernet(f.read())
+def _init_worker(keys):
+    global _worker_fernet
+    _worker_fernet = make_fernet(keys)
 
-with open("data/node_2_data.csv", "r") as f:
-    reader = csv.reader(f)
-    header = next(reader)
 
-    for row in reader:
+def node_files(data_dir):
+    """Node data files (CSV and segment) in a directory"""
+    paths = []
+    for pattern in NODE_FILE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(data_dir, pattern)))
+    return sorted(paths)
+
+
+def plan_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Split a file into (path, start, end) byte ranges decodable independently.
+
+    CSV ranges are aligned on lines by the worker; segment ranges are aligned
+    on segment boundaries here by walking the length prefixes.
+    """
+    size = os.path.getsize(path)
+    if not path.endswith(segments.SEGMENT_EXTENSION):
+        return [(path, start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)] or [(path, 0, 0)]
+
+    chunks = []
+    with open(path, 'rb') as handle:
+        start = len(segments.MAGIC)
+        position = start
+        handle.seek(start)
+        while True:
+            header = handle.read(4)
+            if len(header) < 4:
+                break
+            end = position + 4 + int.from_bytes(header, 'big')
+            if end > size:
+                break
+            handle.seek(end)
+            position = end
+            if position - start >= chunk_bytes:
+                chunks.append((path, start, position))
+                start = position
+    if position > start:
+        chunks.append((path, start, position))
+    return chunks
+
+
+def decrypt_csv_lines(lines, fernet):
+    """Parse node CSV lines, returns (records, rejected_count)"""
+    records = []
+    rejected = 0
+    for row in csv.reader(lines):
         try:
-            # Si ligne chiffrée (format : node_id, data_encrypted, timestamp)
             if len(row) == 3 and row[1].startswith("gAAAAA"):
-                decrypted = fernet.decrypt(row[1].encode()).decode()
-                temperature, humidity = decrypted.split(',')
-                print(f"🔓 Déchiffré → Node {row[0]} | Temp: {temperature}°C | Hum: {humidity}% | Time: {row[2]}")
-            # Si ligne ancienne (claire)
+                temperature, humidity = fernet.decrypt(row[1].encode()).decode().split(',')
+                records.append((int(row[0]), row[2], float(temperature), float(humidity)))
             elif len(row) == 4:
-                print(f"🟡 Donnée claire → Node {row[0]} | Temp: {row[1]}°C | Hum: {row[2]}% | Time: {row[3]}")
-            else:
-                print("⚠️ Ligne non reconnue :", row)
-        except Exception as e:
-            print("⛔ Erreur de déchiffrement :", row)
+                records.append((int(row[0]), row[3], float(row[1]), float(row[2])))
+            elif row:
+                rejected += 1
+        except Exception:
+            rejected += 1
+    return records, rejected
+
+
+def decrypt_chunk(chunk):
+    """Worker: decrypt one (path, start, end) range, returns (records, rejected_count)"""
+    path, start, end = chunk
+    fernet = _worker_fernet
+
+    if path.endswith(segments.SEGMENT_EXTENSION):
+        records = []
+        rejected = 0
+        with open(path, 'rb') as handle:
+            handle.seek(start)
+            while handle.tell() < end:
+                length = int.from_bytes(handle.read(4), 'big')
+                try:
+                    records.extend(segments.decrypt_token(fernet, handle.read(length)))
+                except segments.SegmentError:
+                    rejected += 1
+        return records, rejected
+
+    with open(path, 'rb') as handle:
+        if start == 0:
+            handle.readline()  # Header
+        else:
+            # The line straddling the boundary belongs to the previous chunk
+            handle.seek(start - 1)
+            handle.readline()
+        lines = []
+        while handle.tell() < end:
+            line = handle.readline()
+            if not line:
+                break
+            lines.append(line.decode('utf-8', errors='replace'))
+    return decrypt_csv_lines(lines, fernet)
+
+
+def iter_decrypted(paths, keys, workers=None, chunk_bytes=CHUNK_BYTES):
+    """Yield (records, rejected_count) per chunk, in file order, decrypted in parallel.
+
+    At most a few chunks per worker are in flight, so memory stays bounded
+    however large the files are.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = (chunk for path in paths for chunk in plan_chunks(path, chunk_bytes))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keys,)) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(decrypt_chunk, chunk))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+class CSVSink:
+    """Stream records into one CSV file (or stdout)"""
+    def __init__(self, output):
+        self.file = open(output, 'w', newline='') if output else sys.stdout
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['node_id', 'temperature', 'humidity', 'timestamp'])
+
+    def write(self, records):
+        self.writer.writerows((node_id, temperature, humidity, timestamp)
+                              for node_id, timestamp, temperature, humidity in records)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ColumnarSink:
+    """Append records to one raw binary file per column, described by schema.json"""
+    COLUMNS = {
+        'node_id': 'int32',
+        'timestamp': 'datetime64[s]',
+        'temperature': 'float64',
+        'humidity': 'float64',
+    }
+
+    def __init__(self, output):
+        self.directory = output or 'decrypted_columns'
+        os.makedirs(self.directory, exist_ok=True)
+        self.files = {name: open(os.path.join(self.directory, f"{name}.bin"), 'wb') for name in self.COLUMNS}
+        self.rows = 0
+
+    def write(self, records):
+        if not records:
+            return
+        node_ids, timestamps, temperatures, humidities = zip(*records)
+        columns = {
+            'node_id': np.array(node_ids, dtype=np.int32),
+            'timestamp': to_datetime64(timestamps),
+            'temperature': np.array(temperatures, dtype=np.float64),
+            'humidity': np.array(humidities, dtype=np.float64),
+        }
+        for name, values in columns.items():
+            values.tofile(self.files[name])
+        self.rows += len(records)
+
+    def close(self):
+        for handle in self.files.values():
+            handle.close()
+        with open(os.path.join(self.directory, 'schema.json'), 'w') as f:
+            json.dump({"rows": self.rows, "columns": self.COLUMNS}, f, indent=2)
+
+
+class SQLiteSink:
+    """Insert records into the sensor_data table, one transaction per chunk"""
+    def __init__(self, output):
+        from database import Database
+        self.db = Database(output)
+
+    def write(self, records):
+        if records:
+            self.db.add_sensor_data_bulk(
+                (node_id, temperature, humidity, timestamp)
+                for node_id, timestamp, temperature, humidity in records
+            )
+
+    def close(self):
+        self.db.close_connection()
+
+
+SINKS = {'csv': CSVSink, 'columnar': ColumnarSink, 'sqlite': SQLiteSink}
+
+
+def decrypt_to(paths, output_format='csv', output=None, keys=None, workers=None):
+    """Decrypt files into the chosen sink, returns (record_count, rejected_count)"""
+    keys = keys or load_keys()
+    sink = SINKS[output_format](output)
+    records_total = rejected_total = 0
+    try:
+        for records, rejected in iter_decrypted(paths, keys, workers):
+            sink.write(records)
+            records_total += len(records)
+            rejected_total += rejected
+    finally:
+        sink.close()
+    return records_total, rejected_total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decrypt node data files in parallel")
+    parser.add_argument('files', nargs='*', help="Files to decrypt (default: every node file in --data-dir)")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--format', choices=sorted(SINKS), default='csv')
+    parser.add_argument('--output', help="CSV file, columnar directory or SQLite database (csv defaults to stdout)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    paths = args.files or node_files(args.data_dir)
+    if not paths:
+        print("⚠️ Aucun fichier à déchiffrer", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    records, rejected = decrypt_to(paths, args.format, args.output, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"🔓 {records} lignes déchiffrées depuis {len(paths)} fichiers en {elapsed:.1f}s "
+          f"({rejected} lignes non reconnues)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,11 @@
-from cryptography.fernet import Fernet
+from key_ring import KeyRing
 
-# Générer une clé Fernet
-key = Fernet.generate_key()
+# Ajouter une nouvelle version de clé Fernet au key-ring
+# (les anciennes versions restent disponibles pour déchiffrer les données existantes)
+key_ring = KeyRing()
+version = key_ring.rotate()
 
-# L'afficher à l'écran
-print("✅ Clé générée :")
-print(key.decode())
-
-# Sauvegarder dans un fichier key.txt
-with open("key.txt", "wb") as f:
-    f.write(key)
-
-print("🔐 Clé enregistrée dans key.txt")
+print(f"✅ Clé générée : version {version}")
+print("🔐 Clé enregistrée dans keyring.json (et key.txt comme clé principale)")
+print("ℹ️ Pour rechiffrer les données existantes : python key_ring.py reencrypt "
+      "(serveur arrêté)")
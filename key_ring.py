@@ -0,0 +1,222 @@
+"""Versioned Fernet key-ring with online rotation and bulk re-encryption.
+
+Keys live in keyring.json as numbered versions; the newest version is the
+primary key used for encryption, older ones are kept for decryption
+(MultiFernet). The first time the key-ring is loaded it is bootstrapped from
+the legacy key.txt, which is afterwards kept in sync with the primary key for
+tools that still read it.
+
+Usage:
+    python key_ring.py status
+    python key_ring.py rotate [--reencrypt] [--data-dir data] [--workers N]
+    python key_ring.py reencrypt [--data-dir data] [--workers N]
+
+Re-encrypt from the command line only while the server is stopped;
+a running server rotates online through POST /api/keys/rotate.
+"""
+import argparse
+import base64
+import csv
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from config import Config
+import segments
+
+REKEY_SUFFIX = '.rekey'
+
+
+class KeyRing:
+    """Versioned keys on disk with a cached MultiFernet, reloaded when the file changes"""
+    def __init__(self, path=None, legacy_key_file=None):
+        self.path = path or Config.KEYRING_FILE
+        self.legacy_key_file = legacy_key_file or Config.KEY_FILE
+        self.lock = threading.Lock()
+        self.entries = []
+        self.loaded_mtime = None
+        self._fernet = None
+        self.load()
+
+    def load(self):
+        """Read keyring.json, bootstrapping it from key.txt the first time"""
+        with self.lock:
+            if not os.path.exists(self.path):
+                if os.path.exists(self.legacy_key_file):
+                    with open(self.legacy_key_file, 'rb') as f:
+                        key = f.read().strip().decode()
+                else:
+                    key = Fernet.generate_key().decode()
+                self.entries = [{"version": 1, "key": key, "created": datetime.now().isoformat()}]
+                self._save()
+            with open(self.path, 'r') as f:
+                self.entries = sorted(json.load(f)["keys"], key=lambda entry: entry["version"], reverse=True)
+            self.loaded_mtime = os.path.getmtime(self.path)
+            self._fernet = None
+
+    def _save(self):
+        # Write-then-rename so readers never see a half-written key-ring
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({"keys": self.entries}, f, indent=2)
+        os.replace(temporary, self.path)
+        with open(self.legacy_key_file, 'wb') as f:
+            f.write(self.entries[0]["key"].encode())
+
+    def _refresh(self):
+        try:
+            if os.path.getmtime(self.path) != self.loaded_mtime:
+                self.load()
+        except OSError:
+            pass
+
+    @property
+    def primary_version(self):
+        return self.entries[0]["version"]
+
+    def keys(self):
+        """Key bytes, primary first"""
+        self._refresh()
+        return [entry["key"].encode() for entry in self.entries]
+
+    def fernet(self):
+        """Cached MultiFernet: encrypts with the primary key, decrypts with any version"""
+        self._refresh()
+        with self.lock:
+            if self._fernet is None:
+                self._fernet = MultiFernet([Fernet(entry["key"].encode()) for entry in self.entries])
+            return self._fernet
+
+    def rotate(self):
+        """Add a new primary key version, returns its number"""
+        self._refresh()
+        with self.lock:
+            version = self.entries[0]["version"] + 1
+            self.entries.insert(0, {
+                "version": version,
+                "key": Fernet.generate_key().decode(),
+                "created": datetime.now().isoformat()
+            })
+            self._save()
+            self.loaded_mtime = os.path.getmtime(self.path)
+            self._fernet = None
+        return version
+
+
+def rewrite_encrypted(source, target, fernet, end=None):
+    """Copy a node file from the source position to target, re-encrypting with the primary key.
+
+    Stops before end (or at EOF) on a record boundary and returns
+    (position_reached, records_rotated, records_failed). Records that cannot
+    be decrypted are copied unchanged.
+    """
+    rotated = failed = 0
+    if source.name.endswith(segments.SEGMENT_EXTENSION):
+        if source.tell() == 0:
+            target.write(source.read(len(segments.MAGIC)))
+        position = source.tell()
+        for position_after, token in segments.iter_tokens(source):
+            if end is not None and position_after > end:
+                break
+            try:
+                token = base64.urlsafe_b64decode(fernet.rotate(base64.urlsafe_b64encode(token)))
+                rotated += 1
+            except InvalidToken:
+                failed += 1
+            target.write(len(token).to_bytes(4, 'big') + token)
+            position = position_after
+        source.seek(position)
+        return position, rotated, failed
+
+    position = source.tell()
+    while end is None or position < end:
+        line = source.readline()
+        if not line.endswith(b'\n'):
+            break  # EOF or a line still being written
+        row = next(csv.reader([line.decode()]), [])
+        if len(row) == 3 and row[1].startswith('gAAAAA'):
+            try:
+                row[1] = fernet.rotate(row[1].encode()).decode()
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(row)
+                line = buffer.getvalue().encode()
+                rotated += 1
+            except InvalidToken:
+                failed += 1
+        target.write(line)
+        position = source.tell()
+    source.seek(position)
+    return position, rotated, failed
+
+
+def _reencrypt_prefix(args):
+    """Worker: re-encrypt a file up to a size snapshot into a temporary copy"""
+    path, end, keys = args
+    fernet = MultiFernet([Fernet(key) for key in keys])
+    with open(path, 'rb') as source, open(path + REKEY_SUFFIX, 'wb') as target:
+        return (path,) + rewrite_encrypted(source, target, fernet, end)
+
+
+def reencrypt_files(paths, keyring, lock_for=None, workers=None):
+    """Re-encrypt node files under the key-ring's primary key, in parallel.
+
+    Worker processes rewrite each file up to its current size; the few
+    records appended meanwhile are finished in this process while
+    lock_for(path) is held, then the copy replaces the original. Passing the
+    server writer's exclusive() as lock_for lets ingest continue throughout.
+    Returns {"files", "rotated", "failed"} totals.
+    """
+    lock_for = lock_for or (lambda path: nullcontext())
+    keys = keyring.keys()
+    fernet = keyring.fernet()
+    summary = {"files": 0, "rotated": 0, "failed": 0}
+    jobs = [(path, os.path.getsize(path), keys) for path in paths]
+    if not jobs:
+        return summary
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        for path, position, rotated, failed in executor.map(_reencrypt_prefix, jobs):
+            temporary = path + REKEY_SUFFIX
+            with lock_for(path):
+                with open(path, 'rb') as source, open(temporary, 'ab') as target:
+                    source.seek(position)
+                    _, tail_rotated, tail_failed = rewrite_encrypted(source, target, fernet)
+                    target.write(source.read())  # Incomplete trailing record, copied as is
+                os.replace(temporary, path)
+            summary["files"] += 1
+            summary["rotated"] += rotated + tail_rotated
+            summary["failed"] += failed + tail_failed
+    return summary
+
+
+def main(argv=None):
+    from decrypt_csv import node_files
+
+    parser = argparse.ArgumentParser(description="Manage the Fernet key-ring")
+    parser.add_argument('command', choices=['status', 'rotate', 'reencrypt'])
+    parser.add_argument('--reencrypt', action='store_true', help="Re-encrypt node files with the new key")
+    parser.add_argument('--data-dir', default=Config.DATA_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    keyring = KeyRing()
+    if args.command == 'rotate':
+        print(f"🔐 Nouvelle clé principale : version {keyring.rotate()}")
+    if args.command == 'reencrypt' or args.reencrypt:
+        summary = reencrypt_files(node_files(args.data_dir), keyring, workers=args.workers)
+        print(f"🔁 {summary['rotated']} enregistrements rechiffrés dans {summary['files']} fichiers "
+              f"({summary['failed']} illisibles)")
+    versions = ", ".join(str(entry["version"]) for entry in keyring.entries)
+    print(f"Clé principale : version {keyring.primary_version} (versions disponibles : {versions})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Shared, incrementally refreshed cache of the node data files for the desktop client.
+
+Every CSV (plaintext rows or 'data_encrypted' Fernet tokens) and segment
+file of the data directory is held as columns, keyed by path. A refresh
+follows each file with a TailReader and only parses what changed: bytes
+appended since the last read are decoded and decrypted, a file that shrank,
+was replaced or was rewritten is parsed again from the start. A last line
+without newline is picked up once the file stops changing.
+"""
+import os
+import threading
+from array import array
+
+import numpy as np
+
+from config import Config
+import chart_data
+import segments
+import tail_reader
+import thresholds
+
+
+class FileColumns:
+    """Parsed readings of one file"""
+    def __init__(self, generation=0):
+        self.generation = generation  # Bumped when the file is parsed again from the start
+        self.node_ids = array('q')
+        self.timestamps = []
+        self.temperatures = array('d')
+        self.humidities = array('d')
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def extend(self, records):
+        for node_id, timestamp, temperature, humidity in records:
+            self.node_ids.append(node_id)
+            self.timestamps.append(timestamp)
+            self.temperatures.append(temperature)
+            self.humidities.append(humidity)
+
+    def rows(self, start=0):
+        """(node_ids, temperatures, humidities, timestamps) columns from row start on"""
+        return (list(self.node_ids[start:]), list(self.temperatures[start:]),
+                list(self.humidities[start:]), self.timestamps[start:])
+
+
+class NodeDataCache:
+    """Columnar readings of every node file, shared by the table, charts and alert check.
+
+    Safe to use from several worker threads; returned columns are copies.
+    """
+    def __init__(self, data_dir=None, keyring=None):
+        self.data_dir = data_dir or Config.DATA_DIR
+        self.reader = tail_reader.TailReader(keyring=keyring)  # In memory, like the columns
+        self.files = {}  # path -> FileColumns
+        self.lock = threading.Lock()
+
+    def paths(self):
+        if not os.path.isdir(self.data_dir):
+            return []
+        return sorted(
+            os.path.join(self.data_dir, name) for name in os.listdir(self.data_dir)
+            if name.endswith('.csv') or name.endswith(segments.SEGMENT_EXTENSION)
+        )
+
+    def refresh(self):
+        """Bring every file up to date, returns the paths whose rows changed"""
+        changed = []
+        with self.lock:
+            paths = self.paths()
+            for path in set(self.files) - set(paths):
+                del self.files[path]
+                self.reader.forget(path)
+                changed.append(path)
+            for path in paths:
+                try:
+                    if self._refresh_file(path):
+                        changed.append(path)
+                except OSError as e:
+                    print(f"Error reading {path}: {e}")
+        return changed
+
+    def _refresh_file(self, path):
+        state = self.reader.check(path)
+        entry = self.files.get(path)
+        if entry is not None and state == tail_reader.UNCHANGED:
+            return False
+        if entry is None or state == tail_reader.RESET:
+            entry = self.files[path] = FileColumns(entry.generation + 1 if entry is not None else 0)
+
+        before = len(entry)
+        for records in self.reader.iter_batches(path, check=False):
+            entry.extend(records)
+        entry.rejected = self.reader.checkpoint(path)['rejected']
+        return len(entry) != before or state == tail_reader.RESET
+
+    def read_new(self, positions):
+        """Rows added since positions ({path: (generation, row_count)}), for incremental consumers.
+
+        Returns (columns, new_positions, reloaded): columns are (node_ids,
+        temperatures, humidities, timestamps). When a file was parsed again
+        from the start the positions no longer apply: every row is returned
+        and reloaded is True, the consumer should drop what it had.
+        """
+        with self.lock:
+            reloaded = any(
+                path not in self.files or self.files[path].generation != generation
+                for path, (generation, _) in positions.items()
+            )
+            columns = ([], [], [], [])
+            new_positions = {}
+            for path, entry in self.files.items():
+                start = 0 if reloaded else positions.get(path, (entry.generation, 0))[1]
+                for column, values in zip(columns, entry.rows(start)):
+                    column.extend(values)
+                new_positions[path] = (entry.generation, len(entry))
+        return columns, new_positions, reloaded
+
+    def read_new_classified(self, positions):
+        """read_new, refreshing first and adding the threshold status column"""
+        self.refresh()
+        (node_ids, temperatures, humidities, timestamps), positions, reloaded = self.read_new(positions)
+        statuses = thresholds.status_labels(*thresholds.classify(temperatures, humidities))
+        return (node_ids, temperatures, humidities, timestamps, statuses), positions, reloaded
+
+    def node_series(self):
+        """{node_id: (timestamps, temperatures, humidities)} numpy columns sorted by time, for the charts"""
+        self.refresh()
+        (node_ids, temperatures, humidities, timestamps), _, _ = self.read_new({})
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        temperatures = np.asarray(temperatures, dtype=float)
+        humidities = np.asarray(humidities, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=object)
+        series = {}
+        for node_id in np.unique(node_ids).tolist():
+            mask = node_ids == node_id
+            node = chart_data.sort_series(timestamps[mask].tolist(), temperatures[mask], humidities[mask])
+            if len(node[0]):
+                series[node_id] = node
+        return series
@@ -0,0 +1,231 @@
+"""Encrypted binary segment files for node readings.
+
+A segment file starts with a short header (MAGIC) followed by segments:
+
+    4-byte big-endian length | Fernet token (raw bytes, not base64)
+
+Each token encrypts one zlib-compressed block of records, so a whole block of
+readings shares one encryption and one HMAC (Fernet is authenticated, a
+tampered or truncated segment fails to decrypt). A record is packed as
+
+    node_id (uint32) | temperature (float64) | humidity (float64) |
+    timestamp length (uint8) | timestamp (UTF-8)
+
+Usage:
+    python segments.py convert data/node_2_data.csv [more.csv ...]
+    python segments.py dump data/node_2_data.seg
+
+convert merges a CSV into the node's segment file and renames the CSV to
+node_2_data.csv.converted once done.
+"""
+import base64
+import csv
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = b'FSEG\x01'
+SEGMENT_EXTENSION = '.seg'
+RETIRED_SUFFIX = '.converted'  # Appended to a CSV once converted (no longer a node data file)
+
+_LENGTH = struct.Struct('>I')
+_RECORD = struct.Struct('<IddB')
+
+
+class SegmentError(Exception):
+    """Raised for files that are not segment files or have a corrupt segment"""
+
+
+def pack_records(records):
+    """Pack (node_id, timestamp, temperature, humidity) records into a compressed block"""
+    parts = []
+    for node_id, timestamp, temperature, humidity in records:
+        encoded = str(timestamp).encode()[:255]
+        parts.append(_RECORD.pack(node_id, temperature, humidity, len(encoded)))
+        parts.append(encoded)
+    return zlib.compress(b''.join(parts))
+
+
+def unpack_records(block):
+    """Inverse of pack_records"""
+    data = zlib.decompress(block)
+    records = []
+    position = 0
+    while position < len(data):
+        node_id, temperature, humidity, length = _RECORD.unpack_from(data, position)
+        position += _RECORD.size
+        timestamp = data[position:position + length].decode()
+        position += length
+        records.append((node_id, timestamp, temperature, humidity))
+    return records
+
+
+def encode_segment(fernet, records):
+    """Encrypt records into one framed segment (bytes ready to append)"""
+    token = base64.urlsafe_b64decode(fernet.encrypt(pack_records(records)))
+    return _LENGTH.pack(len(token)) + token
+
+
+def append_segment(handle, fernet, records):
+    """Append one segment to an open binary file, writing the header to an empty file"""
+    if handle.tell() == 0:
+        handle.write(MAGIC)
+    handle.write(encode_segment(fernet, records))
+
+
+def iter_tokens(handle):
+    """Yield (end_offset, raw_token) for each complete segment of an open file.
+
+    Reading starts at the handle's position (the file header is skipped when
+    reading from the start). An incomplete trailing segment, e.g. one still
+    being written, ends the iteration.
+    """
+    if handle.tell() == 0:
+        if handle.read(len(MAGIC)) != MAGIC:
+            raise SegmentError(f"{getattr(handle, 'name', 'file')} is not a segment file")
+    while True:
+        header = handle.read(_LENGTH.size)
+        if len(header) < _LENGTH.size:
+            return
+        (length,) = _LENGTH.unpack(header)
+        token = handle.read(length)
+        if len(token) < length:
+            return
+        yield handle.tell(), token
+
+
+def complete_length(handle):
+    """Byte length of the header and complete segments of an open binary file.
+
+    Only the length prefixes are read. A partial header counts as an empty file.
+    """
+    handle.seek(0)
+    header = handle.read(len(MAGIC))
+    if header != MAGIC:
+        if MAGIC.startswith(header):
+            return 0
+        raise SegmentError(f"{getattr(handle, 'name', 'file')} is not a segment file")
+    end = handle.seek(0, os.SEEK_END)
+    position = len(MAGIC)
+    while position + _LENGTH.size <= end:
+        handle.seek(position)
+        (length,) = _LENGTH.unpack(handle.read(_LENGTH.size))
+        if position + _LENGTH.size + length > end:
+            break
+        position += _LENGTH.size + length
+    return position
+
+
+def decrypt_token(fernet, token):
+    """Records of one raw segment token"""
+    try:
+        return unpack_records(fernet.decrypt(base64.urlsafe_b64encode(token)))
+    except Exception as e:
+        raise SegmentError(f"Corrupt or unreadable segment ({type(e).__name__})") from e
+
+
+def iter_segments(path, fernet, offset=0):
+    """Stream (end_offset, records) per segment, starting at a byte offset"""
+    with open(path, 'rb') as handle:
+        handle.seek(offset)
+        for end_offset, token in iter_tokens(handle):
+            yield end_offset, decrypt_token(fernet, token)
+
+
+def iter_records(path, fernet):
+    """Stream (node_id, timestamp, temperature, humidity) records of a segment file"""
+    for _, records in iter_segments(path, fernet):
+        yield from records
+
+
+def parse_csv_row(row, fernet):
+    """Record of a node CSV row, plaintext or 'data_encrypted' Fernet token (ValueError if neither)"""
+    if len(row) == 3 and row[1].startswith('gAAAAA'):
+        temperature, humidity = fernet.decrypt(row[1].encode()).decode().split(',')
+        return int(row[0]), row[2], float(temperature), float(humidity)
+    if len(row) == 4:
+        return int(row[0]), row[3], float(row[1]), float(row[2])
+    raise ValueError(f"unexpected row with {len(row)} fields")
+
+
+def iter_csv_records(csv_path, fernet, rejected=None):
+    """Records of a node CSV; unreadable rows are skipped and appended to rejected if given"""
+    with open(csv_path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Header
+        for line_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            try:
+                yield parse_csv_row(row, fernet)
+            except Exception as e:
+                if rejected is not None:
+                    rejected.append((line_number, e))
+
+
+def convert_csv(csv_path, fernet, segment_path=None, block_size=1000):
+    """Convert a node CSV into a segment file, returns (segment_path, record_count, rejected_rows).
+
+    The segment file is built under a temporary name, with the CSV's records
+    followed by those of an existing segment file for the node, and moved into
+    place once complete; the CSV is then renamed with RETIRED_SUFFIX so
+    readers of the data directory do not see its readings twice. A failed
+    conversion leaves both files untouched. Run it while the server is
+    stopped, as the server appends to the segment files.
+    """
+    segment_path = segment_path or os.path.splitext(csv_path)[0] + SEGMENT_EXTENSION
+    temporary = segment_path + '.tmp'
+    count = 0
+    rejected = []
+    block = []
+    try:
+        with open(temporary, 'wb') as handle:
+            handle.write(MAGIC)
+            for record in iter_csv_records(csv_path, fernet, rejected):
+                block.append(record)
+                if len(block) >= block_size:
+                    append_segment(handle, fernet, block)
+                    count += len(block)
+                    block = []
+            if block:
+                append_segment(handle, fernet, block)
+                count += len(block)
+            if os.path.exists(segment_path):
+                # Keep the readings already stored as segments, after the older CSV ones
+                with open(segment_path, 'rb') as existing:
+                    for _, token in iter_tokens(existing):
+                        handle.write(_LENGTH.pack(len(token)) + token)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, segment_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    os.replace(csv_path, csv_path + RETIRED_SUFFIX)
+    return segment_path, count, rejected
+
+
+def main(argv):
+    from key_ring import KeyRing
+
+    if len(argv) < 3 or argv[1] not in ('convert', 'dump'):
+        print(__doc__)
+        return 1
+    fernet = KeyRing().fernet()
+    for path in argv[2:]:
+        if argv[1] == 'convert':
+            segment_path, count, rejected = convert_csv(path, fernet)
+            before, after = os.path.getsize(path + RETIRED_SUFFIX), os.path.getsize(segment_path)
+            for line_number, error in rejected[:10]:
+                print(f"Skipping line {line_number} due to error: {error}")
+            print(f"{path} -> {segment_path}: {count} records, {len(rejected)} rejected, {before} -> {after} bytes")
+        else:
+            for node_id, timestamp, temperature, humidity in iter_records(path, fernet):
+                print(f"Node {node_id} | Temp: {temperature}°C | Hum: {humidity}% | Time: {timestamp}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,113 +1,613 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import csv
+from array import array
+import atexit
+import base64
+from collections import OrderedDict
+import heapq
+import queue
+from itertools import chain, islice
+from operator import itemgetter
 import os
 from datetime import datetime
+import gzip
+import json
+import math
 import threading
 import time
+import uuid
+import zlib
 from typing import Dict, List, Optional
-from cryptography.fernet import Fernet
+from alert_engine import AlertEngine
+from config import Config
+from decrypt_csv import node_files
+from key_ring import KeyRing, reencrypt_files
+import wire_format
+from write_behind import WriteBehindWriter
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
 DATA_DIR = 'data'
+MAX_BATCH_SIZE = 1000
+MAX_NODE_ID = 2 ** 32 - 1  # Node ids are stored and sent as uint32 (segment files, packed encoding)
+STREAM_CHUNK_SIZE = 500  # Readings serialised per chunk of a streamed response
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'  # Reading timestamps, stored and compared as strings
+# Changes with every server start so sync clients know their sequence numbers are stale
+SERVER_EPOCH = uuid.uuid4().hex
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Charger la clé Fernet
-with open("key.txt", "rb") as f:
-    fernet = Fernet(f.read())
+# Charger les clés Fernet (key-ring versionné, amorcé depuis key.txt)
+key_ring = KeyRing()
 
 # In-memory data store
+class NodeBuffer:
+    """Fixed-capacity ring buffer of one node's readings, stored as columns"""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.seqs = array('q', bytes(8 * capacity))
+        self.timestamps: List[Optional[str]] = [None] * capacity
+        self.temperatures = array('d', bytes(8 * capacity))
+        self.humidities = array('d', bytes(8 * capacity))
+        self.start = 0  # Slot of the oldest reading
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, seq: int, timestamp: str, temperature: float, humidity: float):
+        slot = (self.start + self.size) % self.capacity
+        if self.size == self.capacity:
+            # Full: overwrite the oldest reading
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.size += 1
+        self.seqs[slot] = seq
+        self.timestamps[slot] = timestamp
+        self.temperatures[slot] = temperature
+        self.humidities[slot] = humidity
+
+    def _slot(self, offset: int) -> int:
+        return (self.start + offset) % self.capacity
+
+    def _first_offset_after(self, seq: int) -> int:
+        # Sequence numbers grow with insertion order, so bisect the ring
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.seqs[self._slot(middle)] <= seq:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _select(self, after_seq: int, since: Optional[str], until: Optional[str], limit: Optional[int]):
+        """Slots of the readings read() returns, with its last_seq and more"""
+        slots = []
+        last_seq = after_seq
+        offset = self._first_offset_after(after_seq)
+        while offset < self.size:
+            if limit is not None and len(slots) >= limit:
+                break
+            slot = self._slot(offset)
+            timestamp = self.timestamps[slot]
+            last_seq = self.seqs[slot]
+            offset += 1
+            if (since is not None and timestamp < since) or (until is not None and timestamp > until):
+                continue
+            slots.append(slot)
+        return slots, last_seq, offset < self.size
+
+    def read_columns(self, after_seq: int = 0, since: Optional[str] = None, until: Optional[str] = None,
+                     limit: Optional[int] = None):
+        """Like read(), as (timestamps, temperatures, humidities, last_seq, more) columns"""
+        slots, last_seq, more = self._select(after_seq, since, until, limit)
+        return ([self.timestamps[slot] for slot in slots], [self.temperatures[slot] for slot in slots],
+                [self.humidities[slot] for slot in slots], last_seq, more)
+
+    def read(self, after_seq: int = 0, since: Optional[str] = None, until: Optional[str] = None,
+             limit: Optional[int] = None, with_seq: bool = False):
+        """Readings with seq > after_seq inside [since, until], oldest first.
+
+        Returns (readings, last_seq, more): last_seq is the position to resume
+        from and more tells whether readings past it are still buffered.
+        """
+        slots, last_seq, more = self._select(after_seq, since, until, limit)
+        readings = []
+        for slot in slots:
+            reading = {
+                "timestamp": self.timestamps[slot],
+                "temperature": self.temperatures[slot],
+                "humidity": self.humidities[slot]
+            }
+            if with_seq:
+                reading["seq"] = self.seqs[slot]
+            readings.append(reading)
+        return readings, last_seq, more
+
+    def to_list(self) -> List[Dict]:
+        return self.read()[0]
+
+class AlertStore:
+    """Alerts by stable id, kept in seq order, with unread and per-node indexes.
+
+    An alert that changes (incident update, marked read) gets a new seq and
+    moves to the end, so the changes since a seq are a suffix. A deleted alert
+    leaves a {"id", "seq", "deleted": True} tombstone in that order for sync
+    clients; tombstones count towards the capacity and are pruned oldest first
+    like alerts. Not locked on its own: DataStore calls it under its lock.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: "OrderedDict[int, Dict]" = OrderedDict()  # id -> alert or tombstone
+        self.unread: "OrderedDict[int, Dict]" = OrderedDict()
+        self.by_node: Dict[int, "OrderedDict[int, Dict]"] = {}
+        self.tombstones = 0
+
+    def __len__(self) -> int:
+        return len(self.entries) - self.tombstones
+
+    def get(self, alert_id: int) -> Optional[Dict]:
+        alert = self.entries.get(alert_id)
+        return None if alert is None or alert.get("deleted") else alert
+
+    def _index(self, alert: Dict):
+        self.by_node.setdefault(alert["node_id"], OrderedDict())[alert["id"]] = alert
+        if not alert["read"]:
+            self.unread[alert["id"]] = alert
+
+    def _unindex(self, alert: Dict):
+        node_alerts = self.by_node.get(alert["node_id"])
+        if node_alerts is not None:
+            node_alerts.pop(alert["id"], None)
+            if not node_alerts:
+                del self.by_node[alert["node_id"]]
+        self.unread.pop(alert["id"], None)
+
+    def add(self, alert: Dict):
+        self.entries[alert["id"]] = alert
+        self._index(alert)
+        self.prune()
+
+    def update(self, alert: Dict, seq: Optional[int], fields: Dict):
+        """Apply fields to a stored alert, moving it to the end when given a new seq"""
+        self._unindex(alert)
+        alert.update(fields)
+        if seq is not None:
+            alert["seq"] = seq
+            self.entries.move_to_end(alert["id"])
+        self._index(alert)
+
+    def delete(self, alert: Dict, seq: int) -> Dict:
+        """Replace an alert by its tombstone, returns the tombstone"""
+        self._unindex(alert)
+        tombstone = {"id": alert["id"], "seq": seq, "deleted": True}
+        self.entries[alert["id"]] = tombstone
+        self.entries.move_to_end(alert["id"])
+        self.tombstones += 1
+        self.prune()
+        return tombstone
+
+    def prune(self):
+        while len(self.entries) > self.capacity:
+            _, oldest = self.entries.popitem(last=False)
+            if oldest.get("deleted"):
+                self.tombstones -= 1
+            else:
+                self._unindex(oldest)
+
+    def query(self, unread_only: bool = False, node_id: Optional[int] = None) -> List[Dict]:
+        """Copies of the matching alerts in seq order, read from the smallest index"""
+        if node_id is not None:
+            alerts = self.by_node.get(node_id, {}).values()
+            if unread_only:
+                alerts = (alert for alert in alerts if not alert["read"])
+        elif unread_only:
+            alerts = self.unread.values()
+        else:
+            alerts = (alert for alert in self.entries.values() if not alert.get("deleted"))
+        return [dict(alert) for alert in alerts]
+
+    def changes_after(self, seq: int) -> List[Dict]:
+        """Alerts and tombstones with a seq above the given one, oldest first"""
+        changes = []
+        for alert in reversed(self.entries.values()):
+            if alert["seq"] <= seq:
+                break
+            changes.append(dict(alert))
+        changes.reverse()
+        return changes
+
+class Subscription:
+    """Bounded event queue of one streaming client"""
+    def __init__(self, size: int):
+        self.queue: "queue.Queue" = queue.Queue(maxsize=size)
+        # Set when events had to be dropped because the client fell behind
+        self.overflowed = False
+
+class EventBroker:
+    """Fans out new readings and alerts to streaming subscribers without blocking ingest"""
+    def __init__(self, queue_size: int = Config.STREAM_QUEUE_SIZE, max_subscribers: int = Config.STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self) -> Optional[Subscription]:
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self.queue_size)
+            self.subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, event: str, data: Dict):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait((event, data))
+            except queue.Full:
+                # Slow consumer: stop queueing, it will be told to resync
+                subscription.overflowed = True
+
 class DataStore:
-    def __init__(self):
-        self.nodes: Dict[int, List[Dict]] = {}
-        self.alerts: List[Dict] = []
+    def __init__(self, node_capacity: int = Config.NODE_BUFFER_CAPACITY, alert_capacity: int = Config.ALERT_BUFFER_CAPACITY,
+                 broker: Optional[EventBroker] = None):
+        self.broker = broker
+        self.node_capacity = node_capacity
+        self.nodes: Dict[int, NodeBuffer] = {}
+        self.alerts = AlertStore(alert_capacity)
+        self.reading_seq = 0
+        self.alert_seq = 0
+        self.lock = threading.Lock()
 
     def add_node_data(self, node_id: int, timestamp: str, temperature: float, humidity: float):
-        if node_id not in self.nodes:
-            self.nodes[node_id] = []
-        self.nodes[node_id].append({
-            "timestamp": timestamp,
-            "temperature": temperature,
-            "humidity": humidity
-        })
+        # Buffered timestamps are compared as strings by since/until filters
+        normalized = normalize_timestamp(timestamp)
+        if normalized is None:
+            raise ValueError(f"Invalid timestamp: {timestamp!r}")
+        timestamp = normalized
+        with self.lock:
+            if node_id not in self.nodes:
+                self.nodes[node_id] = NodeBuffer(self.node_capacity)
+            self.reading_seq += 1
+            self.nodes[node_id].append(self.reading_seq, timestamp, temperature, humidity)
+            if self.broker:
+                self.broker.publish("reading", {
+                    "seq": self.reading_seq,
+                    "node_id": node_id,
+                    "timestamp": timestamp,
+                    "temperature": temperature,
+                    "humidity": humidity
+                })
 
-    def add_alert(self, node_id: int, message: str, severity: str, timestamp: str):
-        self.alerts.append({
-            "node_id": node_id,
-            "message": message,
-            "severity": severity,
-            "timestamp": timestamp,
-            "read": False
-        })
+    def read_node_data(self, node_id: int, after_seq: int = 0, since: Optional[str] = None,
+                       until: Optional[str] = None, limit: Optional[int] = None):
+        with self.lock:
+            buffer = self.nodes.get(node_id)
+            if buffer is None:
+                return [], after_seq, False
+            return buffer.read(after_seq, since, until, limit)
+
+    def read_node_columns(self, node_id: int, after_seq: int = 0, since: Optional[str] = None,
+                          until: Optional[str] = None, limit: Optional[int] = None):
+        with self.lock:
+            buffer = self.nodes.get(node_id)
+            if buffer is None:
+                return [], [], [], after_seq, False
+            return buffer.read_columns(after_seq, since, until, limit)
+
+    def add_alert(self, node_id: int, message: str, severity: str, timestamp: str, metric: str = '', **details) -> int:
+        with self.lock:
+            self.alert_seq += 1
+            alert = {
+                "id": self.alert_seq,
+                "seq": self.alert_seq,
+                "node_id": node_id,
+                "message": message,
+                "severity": severity,
+                "timestamp": timestamp,
+                "metric": metric,
+                "read": False,
+                **details
+            }
+            self.alerts.add(alert)
+            self._publish_alert(alert)
+            return alert["id"]
+
+    def _publish_alert(self, alert: Dict):
+        if self.broker:
+            self.broker.publish("alert", dict(alert))
+
+    def update_alert(self, alert_id: int, publish: bool = True, **fields) -> bool:
+        """Change an alert in place; when publishing it gets a new seq so sync and stream clients fetch it again"""
+        with self.lock:
+            alert = self.alerts.get(alert_id)
+            if alert is None:
+                return False
+            seq = None
+            if publish:
+                self.alert_seq += 1
+                seq = self.alert_seq
+            self.alerts.update(alert, seq, fields)
+            if publish:
+                self._publish_alert(alert)
+            return True
+
+    def mark_alerts_read(self, alert_ids: List[int]) -> int:
+        """Mark alerts as read by id, returns how many were unread"""
+        with self.lock:
+            changed = 0
+            for alert_id in alert_ids:
+                alert = self.alerts.get(alert_id)
+                if alert is None or alert["read"]:
+                    continue
+                self.alert_seq += 1
+                self.alerts.update(alert, self.alert_seq, {"read": True})
+                self._publish_alert(alert)
+                changed += 1
+            return changed
+
+    def delete_alerts(self, alert_ids: List[int]) -> int:
+        """Delete alerts by id, returns how many existed"""
+        with self.lock:
+            deleted = 0
+            for alert_id in alert_ids:
+                alert = self.alerts.get(alert_id)
+                if alert is None:
+                    continue
+                self.alert_seq += 1
+                self._publish_alert(self.alerts.delete(alert, self.alert_seq))
+                deleted += 1
+            return deleted
+
+    def read_changes(self, readings_after: int, alerts_after: int, limit: int):
+        """Readings and alerts with a sequence number above the given ones, oldest first.
+
+        Returns (readings, alerts, more): readings are merged across nodes in
+        seq order and capped at limit, more tells whether readings were left out.
+        """
+        with self.lock:
+            per_node = []
+            for node_id, buffer in self.nodes.items():
+                readings = buffer.read(readings_after, limit=limit + 1, with_seq=True)[0]
+                for reading in readings:
+                    reading["node_id"] = node_id
+                per_node.append(readings)
+            readings = list(islice(heapq.merge(*per_node, key=itemgetter("seq")), limit + 1))
+
+            alerts = self.alerts.changes_after(alerts_after)
+        return readings[:limit], alerts, len(readings) > limit
 
     def get_node_data(self, node_id: Optional[int] = None) -> Dict:
         if node_id:
-            return {str(node_id): self.nodes.get(node_id, [])}
-        return self.nodes
+            return {str(node_id): self.read_node_data(node_id)[0]}
+        with self.lock:
+            return {node: buffer.to_list() for node, buffer in self.nodes.items()}
 
-    def get_alerts(self, unread_only: bool = False) -> List[Dict]:
-        if unread_only:
-            return [alert for alert in self.alerts if not alert['read']]
-        return self.alerts
+    def get_alerts(self, unread_only: bool = False, node_id: Optional[int] = None) -> List[Dict]:
+        with self.lock:
+            return self.alerts.query(unread_only, node_id)
 
-    def mark_alert_as_read(self, alert_index: int):
-        if 0 <= alert_index < len(self.alerts):
-            self.alerts[alert_index]['read'] = True
+    def mark_alert_as_read(self, alert_id: int) -> bool:
+        return self.mark_alerts_read([alert_id]) > 0
 
-sensor_data = DataStore()
+event_broker = EventBroker()
+sensor_data = DataStore(broker=event_broker)
+alert_engine = AlertEngine(sensor_data)
 
 def check_thresholds(node_id: int, temperature: float, humidity: float, timestamp: str):
-    if temperature >= 35:
-        sensor_data.add_alert(node_id, f"Node {node_id}: Critical high temperature ({temperature}°C)", "critical", timestamp)
-    elif temperature >= 30:
-        sensor_data.add_alert(node_id, f"Node {node_id}: High temperature ({temperature}°C)", "high", timestamp)
-    elif temperature <= 5:
-        sensor_data.add_alert(node_id, f"Node {node_id}: Low temperature ({temperature}°C)", "high", timestamp)
-
-    if humidity >= 90:
-        sensor_data.add_alert(node_id, f"Node {node_id}: Critical high humidity ({humidity}%)", "critical", timestamp)
-    elif humidity >= 80:
-        sensor_data.add_alert(node_id, f"Node {node_id}: High humidity ({humidity}%)", "high", timestamp)
-    elif humidity <= 20:
-        sensor_data.add_alert(node_id, f"Node {node_id}: Low humidity ({humidity}%)", "high", timestamp)
+    check_thresholds_batch([node_id], [temperature], [humidity], [timestamp])
+
+def check_thresholds_batch(node_ids: List[int], temperatures: List[float], humidities: List[float], timestamps: List[str]):
+    alert_engine.process(node_ids, temperatures, humidities, timestamps)
+
+def normalize_timestamp(value) -> Optional[str]:
+    """A 'YYYY-MM-DD HH:MM:SS' timestamp string, zero-padded so stored timestamps compare
+    as strings, or None when value is not one"""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT).strftime(TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+def normalize_bound(value: Optional[str], end_of_day: bool = False) -> Optional[str]:
+    """A since/until query value as a timestamp, ValueError otherwise.
+
+    A 'YYYY-MM-DD' date stands for the start of that day, or its last second
+    with end_of_day (an inclusive until covers the whole day).
+    """
+    if value is None:
+        return None
+    normalized = normalize_timestamp(value)
+    if normalized is not None:
+        return normalized
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d')
+        return day.strftime('%Y-%m-%d 23:59:59' if end_of_day else TIMESTAMP_FORMAT)
+    except ValueError:
+        raise ValueError("since and until must be formatted as YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+
+def parse_reading(data):
+    """Validate one reading payload, returns (reading, error_message)"""
+    if not isinstance(data, dict) or not all(key in data for key in ['node_id', 'temperature', 'humidity']):
+        return None, "Missing required fields (node_id, temperature, humidity)"
+    try:
+        reading = {
+            "node_id": int(data['node_id']),
+            "temperature": float(data['temperature']),
+            "humidity": float(data['humidity']),
+            "timestamp": datetime.now().strftime(TIMESTAMP_FORMAT)
+        }
+    except (TypeError, ValueError) as e:
+        return None, f"Invalid data format: {str(e)}"
+    if not 0 <= reading["node_id"] <= MAX_NODE_ID:
+        return None, f"node_id must be between 0 and {MAX_NODE_ID}"
+    if not (math.isfinite(reading["temperature"]) and math.isfinite(reading["humidity"])):
+        # NaN and infinity would be served back as invalid JSON
+        return None, "temperature and humidity must be finite numbers"
+    if 'timestamp' in data:
+        reading["timestamp"] = normalize_timestamp(data['timestamp'])
+        if reading["timestamp"] is None:
+            return None, "timestamp must be a string formatted as YYYY-MM-DD HH:MM:SS"
+    return reading, None
+
+# Encrypted persistence runs on a background thread
+csv_writer = WriteBehindWriter(DATA_DIR, key_ring)
+csv_writer.start()
+atexit.register(csv_writer.close)
+
+def save_node_readings(node_id: int, readings: List[Dict]):
+    """Queue readings for the background writer (raises queue.Full under overload)"""
+    csv_writer.submit(node_id, readings)
+
+def parse_batch_body():
+    """Read a batch request body as a JSON array or NDJSON, returns a list of payloads"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        payloads = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                payloads.append(json.loads(line))
+            except ValueError as e:
+                payloads.append(ValueError(f"Invalid JSON line: {str(e)}"))
+        return payloads
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list):
+        raise ValueError("Body must be a JSON array of readings, an object with a 'readings' array, or NDJSON")
+    return data
+
+# Response compression
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/csv',
+                          wire_format.COLUMNAR, wire_format.MSGPACK, wire_format.PACKED}
+
+def gzip_chunks(chunks, level: int):
+    """Gzip a streamed body chunk by chunk, so it is never held in memory whole"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+@app.after_request
+def compress_response(response):
+    """Gzip JSON and text responses for clients sending Accept-Encoding: gzip.
+
+    Event streams are left alone: each event must reach the client as soon
+    as it is written.
+    """
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+
+    if response.is_streamed:
+        response.response = gzip_chunks(response.response, Config.GZIP_LEVEL)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.GZIP_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(data, Config.GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 @app.route('/api/sensor_data', methods=['POST'])
 def receive_sensor_data():
     try:
-        data = request.get_json()
-        if not all(key in data for key in ['node_id', 'temperature', 'humidity']):
-            return jsonify({"status": "error", "message": "Missing required fields (node_id, temperature, humidity)"}), 400
+        reading, error = parse_reading(request.get_json())
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
 
+        node_id = reading['node_id']
         try:
-            node_id = int(data['node_id'])
-            temperature = float(data['temperature'])
-            humidity = float(data['humidity'])
-            timestamp = data.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-        except ValueError as e:
-            return jsonify({"status": "error", "message": f"Invalid data format: {str(e)}"}), 400
+            save_node_readings(node_id, [reading])
+        except queue.Full:
+            return jsonify({"status": "error", "message": "Storage queue is full, retry later"}), 503
+        sensor_data.add_node_data(node_id, reading['timestamp'], reading['temperature'], reading['humidity'])
+        check_thresholds(node_id, reading['temperature'], reading['humidity'], reading['timestamp'])
+
+        return jsonify({"status": "success"})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
-        sensor_data.add_node_data(node_id, timestamp, temperature, humidity)
+@app.route('/api/sensor_data/batch', methods=['POST'])
+def receive_sensor_data_batch():
+    try:
+        try:
+            payloads = parse_batch_body()
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
 
-        # 🔐 Chiffrer les données avant sauvegarde CSV
-        data_string = f"{temperature},{humidity}".encode()
-        data_encrypted = fernet.encrypt(data_string).decode()
+        if not payloads:
+            return jsonify({"status": "error", "message": "Batch is empty"}), 400
+        if len(payloads) > MAX_BATCH_SIZE:
+            return jsonify({"status": "error", "message": f"Batch too large (max {MAX_BATCH_SIZE} readings)"}), 413
 
-        filename = f"node_{node_id}_data.csv"
-        filepath = os.path.join(DATA_DIR, filename)
-        file_exists = os.path.isfile(filepath)
+        # Validate the whole batch first, then group valid readings per node
+        results = []
+        by_node: Dict[int, List[Dict]] = {}
+        for index, payload in enumerate(payloads):
+            if isinstance(payload, Exception):
+                reading, error = None, str(payload)
+            else:
+                reading, error = parse_reading(payload)
+            if error:
+                results.append({"index": index, "status": "error", "message": error})
+                continue
+            results.append({"index": index, "status": "success"})
+            by_node.setdefault(reading['node_id'], []).append((index, reading))
 
-        with open(filepath, 'a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(['node_id', 'data_encrypted', 'timestamp'])
-            writer.writerow([node_id, data_encrypted, timestamp])
+        for node_id, indexed in by_node.items():
+            readings = [reading for _, reading in indexed]
+            try:
+                save_node_readings(node_id, readings)
+            except queue.Full:
+                for index, _ in indexed:
+                    results[index] = {"index": index, "status": "error", "message": "Storage queue is full, retry later"}
+                continue
+            for reading in readings:
+                sensor_data.add_node_data(node_id, reading['timestamp'], reading['temperature'], reading['humidity'])
+            check_thresholds_batch(
+                [node_id] * len(readings),
+                [reading['temperature'] for reading in readings],
+                [reading['humidity'] for reading in readings],
+                [reading['timestamp'] for reading in readings]
+            )
 
-        check_thresholds(node_id, temperature, humidity, timestamp)
+        accepted = sum(1 for result in results if result['status'] == 'success')
+        rejected = len(results) - accepted
+        if rejected == 0:
+            status = "success"
+        elif accepted == 0:
+            status = "error"
+        else:
+            status = "partial"
 
-        return jsonify({"status": "success"})
+        response = jsonify({"status": status, "accepted": accepted, "rejected": rejected, "results": results})
+        return response, (200 if accepted else 400)
 
     except Exception as e:
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
@@ -118,7 +618,8 @@ def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "node_count": len(sensor_data.nodes),
-        "alert_count": len(sensor_data.alerts)
+        "alert_count": len(sensor_data.alerts),
+        "writer": csv_writer.stats()
     })
 
 @app.route('/api/test', methods=['GET', 'POST'])
@@ -131,42 +632,324 @@ def test_endpoint():
             return jsonify({"status": "error", "message": str(e)}), 400
     return jsonify({"status": "success", "message": "GET received", "timestamp": datetime.now().isoformat()})
 
+def encode_cursor(positions: Dict[int, int]) -> str:
+    """Opaque paging cursor: the last returned reading seq of each node"""
+    payload = json.dumps({str(node_id): seq for node_id, seq in positions.items()}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> Dict[int, int]:
+    if not cursor:
+        return {}
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {int(node_id): int(seq) for node_id, seq in positions.items()}
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+def stream_node_data(node_ids: List[int], positions: Dict[int, int], since: Optional[str],
+                     until: Optional[str], limit: Optional[int]):
+    """Generate the /api/get_data JSON body chunk by chunk"""
+    remaining = limit
+    has_more = False
+    # Held back until the first readings are read, so the route can pull the
+    # first chunk and still answer with an error status if reading fails
+    pending = '{"status": "success", "data": {'
+    for index, node_id in enumerate(node_ids):
+        if remaining == 0:
+            # Page is full: only report whether this node still has readings
+            has_more = has_more or sensor_data.read_node_data(node_id, positions.get(node_id, 0), limit=0)[2]
+            continue
+        pending += (', ' if index else '') + json.dumps(str(node_id)) + ': ['
+        first = True
+        while True:
+            chunk_size = STREAM_CHUNK_SIZE if remaining is None else min(STREAM_CHUNK_SIZE, remaining)
+            readings, last_seq, more = sensor_data.read_node_data(
+                node_id, positions.get(node_id, 0), since, until, chunk_size
+            )
+            positions[node_id] = last_seq
+            if readings:
+                yield pending + ('' if first else ', ') + ', '.join(json.dumps(reading) for reading in readings)
+                pending = ''
+                first = False
+            if remaining is not None:
+                remaining -= len(readings)
+            if not more:
+                break
+            if remaining == 0:
+                has_more = True
+                break
+        pending += ']'
+    yield pending + '}, "next_cursor": ' + json.dumps(encode_cursor(positions)) + ', "has_more": ' + json.dumps(has_more) + '}'
+
+def collect_node_columns(node_ids: List[int], positions: Dict[int, int], since: Optional[str],
+                         until: Optional[str], limit: Optional[int]):
+    """Readings per node as columns for the columnar and binary encodings, returns (nodes, has_more)"""
+    remaining = limit
+    has_more = False
+    nodes = {}
+    for node_id in node_ids:
+        if remaining == 0:
+            has_more = has_more or sensor_data.read_node_data(node_id, positions.get(node_id, 0), limit=0)[2]
+            continue
+        timestamps, temperatures, humidities, last_seq, more = sensor_data.read_node_columns(
+            node_id, positions.get(node_id, 0), since, until, remaining
+        )
+        positions[node_id] = last_seq
+        nodes[node_id] = (timestamps, temperatures, humidities)
+        if remaining is not None:
+            remaining -= len(timestamps)
+            has_more = has_more or (more and remaining == 0)
+    return nodes, has_more
+
 @app.route('/api/get_data', methods=['GET'])
 def get_sensor_data():
+    """Readings per node, filtered by optional since/until timestamps.
+
+    limit caps the number of readings in the response; next_cursor resumes
+    after the last one returned. Polling with the cursor of the previous
+    response returns only readings received since. The encoding is chosen
+    by content negotiation, see wire_format.py.
+    """
     try:
+        try:
+            encoding = wire_format.negotiate(request)
+        except wire_format.UnsupportedFormat as e:
+            return jsonify({"status": "error", "message": str(e)}), 406
+
         node_id = request.args.get('node_id')
         if node_id:
             try:
-                node_id = int(node_id)
-                return jsonify({"status": "success", "data": sensor_data.get_node_data(node_id)})
+                node_ids = [int(node_id)]
             except ValueError:
                 return jsonify({"status": "error", "message": "Invalid node_id format"}), 400
+            if not 0 <= node_ids[0] <= MAX_NODE_ID:
+                return jsonify({"status": "error", "message": f"node_id must be between 0 and {MAX_NODE_ID}"}), 400
         else:
-            return jsonify({"status": "success", "data": sensor_data.get_node_data()})
+            with sensor_data.lock:
+                node_ids = sorted(sensor_data.nodes)
+
+        limit = request.args.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+            if not 1 <= limit <= Config.GET_DATA_MAX_LIMIT:
+                return jsonify({"status": "error", "message": f"limit must be between 1 and {Config.GET_DATA_MAX_LIMIT}"}), 400
+
+        try:
+            positions = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        try:
+            since = normalize_bound(request.args.get('since'))
+            until = normalize_bound(request.args.get('until'), end_of_day=True)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        if encoding == 'json':
+            body = stream_node_data(node_ids, positions, since, until, limit)
+            # Errors raised once streaming has started could only truncate the body
+            first_chunk = next(body)
+            return Response(stream_with_context(chain([first_chunk], body)), mimetype='application/json')
+
+        nodes, has_more = collect_node_columns(node_ids, positions, since, until, limit)
+        body, headers = wire_format.encode_readings(encoding, nodes, encode_cursor(positions), has_more)
+        return Response(body, mimetype=wire_format.MIMETYPES[encoding], headers=headers)
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @app.route('/api/get_alerts', methods=['GET'])
 def get_alerts():
     try:
+        try:
+            encoding = wire_format.negotiate(request, formats=('json', 'columnar', 'msgpack'))
+        except wire_format.UnsupportedFormat as e:
+            return jsonify({"status": "error", "message": str(e)}), 406
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-        return jsonify({"status": "success", "alerts": sensor_data.get_alerts(unread_only)})
+        node_id = request.args.get('node_id')
+        if node_id is not None:
+            try:
+                node_id = int(node_id)
+            except ValueError:
+                return jsonify({"status": "error", "message": "Invalid node_id format"}), 400
+        alerts = sensor_data.get_alerts(unread_only, node_id)
+        if encoding == 'json':
+            return jsonify({"status": "success", "alerts": alerts})
+        return Response(wire_format.encode_alerts(encoding, alerts), mimetype=wire_format.MIMETYPES[encoding])
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """Readings and alerts added after the client's last seen sequence numbers"""
+    try:
+        try:
+            readings_after = int(request.args.get('readings_after', 0))
+            alerts_after = int(request.args.get('alerts_after', 0))
+            limit = int(request.args.get('limit', Config.GET_DATA_MAX_LIMIT))
+        except ValueError:
+            return jsonify({"status": "error", "message": "readings_after, alerts_after and limit must be integers"}), 400
+        limit = max(1, min(limit, Config.GET_DATA_MAX_LIMIT))
+
+        # A client synced against a previous server run starts over
+        if request.args.get('epoch') not in (None, SERVER_EPOCH):
+            readings_after = alerts_after = 0
+
+        readings, alerts, has_more = sensor_data.read_changes(readings_after, alerts_after, limit)
+        return jsonify({
+            "status": "success",
+            "epoch": SERVER_EPOCH,
+            "readings": readings,
+            "alerts": alerts,
+            "reading_seq": readings[-1]["seq"] if readings else readings_after,
+            "alert_seq": alerts[-1]["seq"] if alerts else alerts_after,
+            "has_more": has_more
+        })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def format_event(event: str, data: Dict) -> str:
+    """One server-sent event"""
+    event_id = f"id: {data['seq']}\n" if 'seq' in data else ''
+    return f"{event_id}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_subscription(subscription: Subscription):
+    """Generate the event stream of one subscriber until the client goes away"""
+    def positions() -> Dict:
+        return {"epoch": SERVER_EPOCH, "reading_seq": sensor_data.reading_seq, "alert_seq": sensor_data.alert_seq}
+
+    try:
+        yield f"retry: {Config.STREAM_RETRY_MS}\n" + format_event("hello", positions())
+        while True:
+            try:
+                events = [subscription.queue.get(timeout=Config.STREAM_HEARTBEAT_SECONDS)]
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            # Send whatever else is already queued in the same write
+            while len(events) < STREAM_CHUNK_SIZE:
+                try:
+                    events.append(subscription.queue.get_nowait())
+                except queue.Empty:
+                    break
+            yield ''.join(format_event(event, data) for event, data in events)
+
+            if subscription.overflowed:
+                # Events were dropped: discard the backlog and let the client catch up with /api/sync
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                yield format_event("resync", positions())
+    finally:
+        event_broker.unsubscribe(subscription)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-sent events for new readings and alerts.
+
+    Opens with a 'hello' event carrying the current sequence numbers. Clients
+    that fall too far behind receive a 'resync' event and should catch up
+    through /api/sync.
+    """
+    subscription = event_broker.subscribe()
+    if subscription is None:
+        return jsonify({"status": "error", "message": "Too many stream subscribers"}), 503
+    return Response(
+        stream_with_context(stream_subscription(subscription)),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Background re-encryption after a key rotation
+rotation_lock = threading.Lock()
+rotation_status = {"state": "idle", "version": None, "summary": None, "error": None}
+
+def run_reencryption(version: int):
+    """Re-encrypt the node files under the new primary key while ingest continues"""
+    try:
+        csv_writer.flush(timeout=Config.WRITER_SUBMIT_TIMEOUT)
+        summary = reencrypt_files(node_files(DATA_DIR), key_ring, lock_for=csv_writer.exclusive)
+        rotation_status.update(state="done", summary=summary)
+        print(f"🔁 Key version {version}: {summary['rotated']} records re-encrypted in {summary['files']} files")
+    except Exception as e:
+        rotation_status.update(state="error", error=str(e))
+    finally:
+        rotation_lock.release()
+
+@app.route('/api/keys/rotate', methods=['POST'])
+def rotate_keys():
+    """Add a new primary key and re-encrypt stored data in the background (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"status": "error", "message": "Key rotation is only allowed from localhost"}), 403
+    if not rotation_lock.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "A rotation is already running"}), 409
+    try:
+        version = key_ring.rotate()
+        rotation_status.update(state="running", version=version, summary=None, error=None)
+        threading.Thread(target=run_reencryption, args=(version,), name="key-rotation", daemon=True).start()
+        return jsonify({"status": "success", "version": version}), 202
+    except Exception as e:
+        rotation_lock.release()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/keys/status', methods=['GET'])
+def key_status():
+    return jsonify({"status": "success", "primary_version": key_ring.primary_version, "rotation": rotation_status})
+
+def parse_alert_ids(data) -> List[int]:
+    """Alert ids of a bulk request body ({"ids": [...]})"""
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list):
+        raise ValueError("ids must be a list of alert ids")
+    try:
+        return [int(alert_id) for alert_id in ids]
+    except (TypeError, ValueError):
+        raise ValueError("ids must be integers")
+
 @app.route('/api/mark_alert_read', methods=['POST'])
 def mark_alert_read():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"status": "error", "message": "Body must be a JSON object"}), 400
         alert_id = data.get('alert_id')
         if alert_id is None:
             return jsonify({"status": "error", "message": "alert_id is required"}), 400
         try:
             alert_id = int(alert_id)
-            sensor_data.mark_alert_as_read(alert_id)
-            return jsonify({"status": "success"})
-        except ValueError:
+        except (TypeError, ValueError):
             return jsonify({"status": "error", "message": "alert_id must be an integer"}), 400
+        sensor_data.mark_alert_as_read(alert_id)
+        return jsonify({"status": "success"})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/mark_alerts_read', methods=['POST'])
+def mark_alerts_read():
+    """Mark several alerts as read: {"ids": [...]}"""
+    try:
+        try:
+            alert_ids = parse_alert_ids(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify({"status": "success", "updated": sensor_data.mark_alerts_read(alert_ids)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/delete_alerts', methods=['POST'])
+def delete_alerts():
+    """Delete several alerts: {"ids": [...]}"""
+    try:
+        try:
+            alert_ids = parse_alert_ids(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        deleted = sensor_data.delete_alerts(alert_ids)
+        # Ongoing incidents of deleted alerts would keep updating nothing
+        alert_engine.forget_alerts(alert_ids)
+        return jsonify({"status": "success", "deleted": deleted})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -178,10 +961,11 @@ def receive_from_arduino_get():
         node_id = request.args.get('node_id', 1)
         if not temp or not hum:
             return jsonify({"status": "error", "message": "Missing temp or hum"}), 400
-        temp = float(temp)
-        hum = float(hum)
-        node_id = int(node_id)
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        reading, error = parse_reading({"node_id": node_id, "temperature": temp, "humidity": hum})
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+        node_id, temp, hum, timestamp = (reading['node_id'], reading['temperature'],
+                                         reading['humidity'], reading['timestamp'])
         sensor_data.add_node_data(node_id, timestamp, temp, hum)
         # Optionnel : chiffrement ici aussi si nécessaire
         check_thresholds(node_id, temp, hum, timestamp)
@@ -192,7 +976,8 @@ def receive_from_arduino_get():
 
 def run_flask_server():
     from waitress import serve
-    serve(app, host="0.0.0.0", port=5000)
+    # Each open event stream holds a worker thread
+    serve(app, host="0.0.0.0", port=5000, threads=Config.SERVER_THREADS)
 
 if __name__ == '__main__':
     print("Starting Forest Monitoring Server...")
@@ -205,3 +990,4 @@ if __name__ == '__main__':
             time.sleep(1)
     except KeyboardInterrupt:
         print("\nShutting down server...")
+        csv_writer.close()
@@ -0,0 +1,207 @@
+"""Tail-following reader of CSV and segment files with byte-offset checkpoints.
+
+A TailReader remembers, per file, the byte offset up to which records were
+consumed and can persist these checkpoints to a JSON file, so a consumer
+(alert check, import, dashboard cache) only parses what was appended since
+its last run, across restarts and whatever the size of the file.
+
+A file is read again from the start when it was truncated (smaller than its
+checkpoint), rotated (new inode) or rewritten, e.g. re-encrypted after a key
+rotation (the fingerprint of its first bytes changed). A line or segment still
+being written is left for the next read; a last line without a newline is
+returned once the file stops changing, or at once by a final (one-shot) read.
+"""
+import csv
+import json
+import os
+import time
+import zlib
+
+from config import Config
+from decrypt_csv import decrypt_csv_lines
+from key_ring import KeyRing
+import segments
+
+UNCHANGED = 'unchanged'
+APPENDED = 'appended'
+RESET = 'reset'          # New, truncated, rotated or rewritten: read from the start
+
+FINGERPRINT_BYTES = 256  # Leading bytes identifying a file's content
+
+
+def fingerprint(path, size=FINGERPRINT_BYTES):
+    """(length, crc32) of the first size bytes of a file"""
+    with open(path, 'rb') as f:
+        head = f.read(size)
+    return len(head), zlib.crc32(head)
+
+
+class TailReader:
+    """Per-file read positions, optionally persisted to checkpoint_file.
+
+    Readers yield batches; a file's checkpoint moves past a batch when the
+    consumer asks for the next one, and save() writes the checkpoints, so a
+    consumer saving once its work is durable reads every record at least once.
+    """
+    def __init__(self, checkpoint_file=None, keyring=None, chunk_bytes=None):
+        self.checkpoint_file = checkpoint_file
+        self.keyring = keyring
+        self.chunk_bytes = chunk_bytes or Config.TAIL_CHUNK_BYTES
+        self.checkpoints = {}  # Absolute path -> checkpoint dict
+        self.load()
+
+    def load(self):
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file) as f:
+                self.checkpoints = json.load(f)
+
+    def save(self):
+        """Persist the checkpoints (no-op for an in-memory reader)"""
+        if not self.checkpoint_file:
+            return
+        directory = os.path.dirname(self.checkpoint_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.checkpoint_file + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.checkpoints, f)
+        os.replace(temporary, self.checkpoint_file)
+
+    def fernet(self):
+        if self.keyring is None:
+            self.keyring = KeyRing()
+        return self.keyring.fernet()
+
+    def checkpoint(self, path):
+        return self.checkpoints.get(os.path.abspath(path))
+
+    def forget(self, path):
+        self.checkpoints.pop(os.path.abspath(path), None)
+
+    def move(self, source, target):
+        """Carry a checkpoint over when a file is renamed"""
+        checkpoint = self.checkpoints.pop(os.path.abspath(source), None)
+        if checkpoint is not None:
+            self.checkpoints[os.path.abspath(target)] = checkpoint
+
+    def check(self, path):
+        """Compare a file with its checkpoint: UNCHANGED, APPENDED or RESET (checkpoint rewound)"""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        checkpoint = self.checkpoints.get(key)
+        if checkpoint is not None and checkpoint['inode'] == stat.st_ino and stat.st_size >= checkpoint['offset']:
+            if stat.st_size == checkpoint['offset'] and stat.st_mtime_ns == checkpoint['mtime']:
+                return UNCHANGED
+            if self._same_content(path, checkpoint):
+                checkpoint['mtime'] = stat.st_mtime_ns
+                return APPENDED if stat.st_size > checkpoint['offset'] else UNCHANGED
+
+        length, crc = fingerprint(path)
+        self.checkpoints[key] = {
+            'inode': stat.st_ino, 'mtime': stat.st_mtime_ns, 'offset': 0, 'lines': 0,
+            'rejected': 0, 'header': None, 'fingerprint': [length, crc], 'tail': None,
+        }
+        return RESET
+
+    def _same_content(self, path, checkpoint):
+        known_length, known_crc = checkpoint['fingerprint']
+        length, crc = fingerprint(path, known_length)
+        if (length, crc) != (known_length, known_crc):
+            return False
+        if known_length < FINGERPRINT_BYTES:
+            # The file was shorter than the fingerprint, extend it with what was appended
+            checkpoint['fingerprint'] = list(fingerprint(path))
+        return True
+
+    def _tail_complete(self, f, checkpoint, final):
+        """Whether the unterminated last line of an open file is complete.
+
+        It is when the read is final, when the file did not grow since the line
+        was last seen, or when it was not modified for TAIL_SETTLE_SECONDS.
+        """
+        stat = os.fstat(f.fileno())
+        if (final or checkpoint.get('tail') == stat.st_size
+                or time.time() - stat.st_mtime >= Config.TAIL_SETTLE_SECONDS):
+            checkpoint['tail'] = None
+            return True
+        checkpoint['tail'] = stat.st_size
+        return False
+
+    def _line_batches(self, path, checkpoint, max_lines=None, final=False):
+        """Yield (end_offset, lines) of complete lines from the checkpoint offset on"""
+        position = checkpoint['offset']
+        with open(path, 'rb') as f:
+            f.seek(position)
+            pending = b''
+            while True:
+                data = f.read(self.chunk_bytes)
+                if not data:
+                    if pending and self._tail_complete(f, checkpoint, final):
+                        yield position + len(pending), [pending.decode('utf-8', errors='replace')]
+                    return
+                data = pending + data
+                complete = data.rfind(b'\n') + 1
+                pending = data[complete:]
+                if not complete:
+                    continue  # One line longer than a chunk
+                lines = data[:complete].splitlines(keepends=True)
+                step = max_lines or len(lines)
+                for start in range(0, len(lines), step):
+                    batch = lines[start:start + step]
+                    position += sum(map(len, batch))
+                    yield position, [line.decode('utf-8', errors='replace') for line in batch]
+
+    def _csv_batches(self, path, checkpoint, max_lines=None, final=False):
+        """Like _line_batches, the header line of a file is kept in the checkpoint instead"""
+        for end_offset, lines in self._line_batches(path, checkpoint, max_lines, final):
+            if checkpoint['offset'] == 0 and checkpoint['header'] is None and lines:
+                checkpoint['header'] = next(csv.reader(lines[:1]))
+                lines = lines[1:]
+            yield end_offset, lines
+
+    def iter_batches(self, path, check=True, final=False):
+        """Yield lists of new (node_id, timestamp, temperature, humidity) records of a node file.
+
+        Handles plaintext and 'data_encrypted' CSV rows as well as segment
+        files; rejected rows are counted in the checkpoint. Pass check=False
+        when check() was just called to act on its result, final=True when the
+        file is complete (a last line without newline is then read at once).
+        """
+        if check:
+            self.check(path)
+        checkpoint = self.checkpoint(path)
+        fernet = self.fernet()
+        if path.endswith(segments.SEGMENT_EXTENSION):
+            try:
+                for end_offset, records in segments.iter_segments(path, fernet, checkpoint['offset']):
+                    yield records
+                    checkpoint['offset'] = end_offset
+            except segments.SegmentError as e:
+                checkpoint['rejected'] += 1
+                print(f"Error reading {path}: {e}")
+            return
+
+        for end_offset, lines in self._line_batches(path, checkpoint, final=final):
+            if checkpoint['offset'] == 0 and lines and lines[0].startswith('node_id'):
+                lines = lines[1:]
+            records, rejected = decrypt_csv_lines(lines, fernet)
+            checkpoint['rejected'] += rejected
+            yield records
+            checkpoint['offset'] = end_offset
+            checkpoint['lines'] += len(lines)
+
+    def iter_records(self, path):
+        """New records of a node file, one at a time"""
+        for records in self.iter_batches(path):
+            yield from records
+
+    def iter_rows(self, path, max_lines=None, check=True, final=False):
+        """Yield (first_line_number, rows) batches of new CSV rows as dicts keyed by the file's header"""
+        if check:
+            self.check(path)
+        checkpoint = self.checkpoint(path)
+        for end_offset, lines in self._csv_batches(path, checkpoint, max_lines, final):
+            line_number = checkpoint['lines'] + 2  # 1-based, after the header
+            yield line_number, list(csv.DictReader(lines, fieldnames=checkpoint['header']))
+            checkpoint['offset'] = end_offset
+            checkpoint['lines'] += len(lines)
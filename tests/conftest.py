@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'tests', 'data')
+sys.path.insert(0, ROOT)
+
+from key_ring import KeyRing  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory: database, data files and checkpoints land there"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def keyring(tmp_path):
+    return KeyRing(str(tmp_path / 'keyring.json'), str(tmp_path / 'key.txt'))
+
+
+@pytest.fixture
+def no_newline_csv(workdir):
+    """Copy of a node CSV whose last row has no trailing newline"""
+    path = workdir / 'data' / 'no_trailing_newline.csv'
+    shutil.copy(os.path.join(FIXTURES, 'no_trailing_newline.csv'), path)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def server_module(tmp_path_factory):
+    """The server module, imported with its data directory and key-ring in a scratch directory"""
+    directory = tmp_path_factory.mktemp('server')
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        import server
+    finally:
+        os.chdir(previous)
+    server.DATA_DIR = server.csv_writer.data_dir = str(directory / 'data')
+    return server
+
+
+@pytest.fixture
+def client(server_module):
+    return server_module.app.test_client()
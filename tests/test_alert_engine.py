@@ -0,0 +1,39 @@
+from alert_engine import AlertEngine
+
+
+class Store:
+    """In-memory alert store that can lose alerts, like a pruned or deleted AlertStore"""
+    def __init__(self):
+        self.alerts = {}
+
+    def add_alert(self, node_id, message, severity, timestamp, metric, **details):
+        alert_id = len(self.alerts) + 1
+        self.alerts[alert_id] = dict(node_id=node_id, message=message, timestamp=timestamp, metric=metric, **details)
+        return alert_id
+
+    def update_alert(self, alert_id, publish, **fields):
+        if alert_id not in self.alerts:
+            return False
+        self.alerts[alert_id].update(fields)
+        return True
+
+
+def test_incident_of_a_lost_alert_opens_a_new_alert():
+    store = Store()
+    engine = AlertEngine(store, update_interval=3600)
+    engine.process([1], [60.0], [50.0], ['2025-04-01 10:00:00'])
+    store.alerts.clear()
+
+    engine.process([1], [61.0], [50.0], ['2025-04-01 10:00:05'])
+    (alert,) = store.alerts.values()
+    assert alert["metric"] == 'temperature'
+    assert alert["count"] == 2 and alert["peak"] == 61.0
+    assert alert["timestamp"] == '2025-04-01 10:00:00'
+
+
+def test_forget_alerts_drops_their_incidents():
+    store = Store()
+    engine = AlertEngine(store)
+    engine.process([1, 2], [60.0, 60.0], [50.0, 50.0], ['2025-04-01 10:00:00'] * 2)
+    engine.forget_alerts([1])
+    assert [incident.alert_id for incident in engine.incidents.values()] == [2]
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import Config
+from database import Database
+
+START = datetime(2025, 6, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / 'db.sqlite'))
+
+
+@pytest.fixture
+def readings(db):
+    """Node 1 every 30 minutes over three days, temperature 10 + i % 4"""
+    rows = [(1, 10.0 + index % 4, 50.0, (START + timedelta(minutes=30 * index)).strftime('%Y-%m-%d %H:%M:%S'))
+            for index in range(3 * 48)]
+    db.add_sensor_data_bulk(rows)
+    return rows
+
+
+def test_single_row_inserts_are_folded_in_batches(db, monkeypatch):
+    monkeypatch.setattr(Config, 'ROLLUP_FOLD_ROWS', 3)
+    monkeypatch.setattr(Config, 'ROLLUP_FOLD_INTERVAL', 3600)
+    db.add_sensor_data(1, 20.0, 50.0)
+    db.add_sensor_data(1, 21.0, 50.0)
+    assert db.get_watermark('rollups_last_id') == 0
+    db.add_sensor_data(1, 22.0, 50.0)
+    assert db.get_watermark('rollups_last_id') == 3
+
+
+def test_series_reads_pending_inserts(db, monkeypatch):
+    monkeypatch.setattr(Config, 'ROLLUP_FOLD_ROWS', 1000)
+    db.add_sensor_data(1, 20.0, 50.0)
+    resolution, rows = db.get_sensor_series(resolution='day')
+    assert resolution == 'day' and rows[0][2] == 1
+
+
+def test_series_resolution_fits_max_points(db, readings):
+    # One hour fits at minute resolution, and its two raw readings too
+    resolution, rows = db.get_sensor_series(START, START + timedelta(minutes=59), max_points=60)
+    assert resolution == 'raw' and [row[3] for row in rows] == [10.0, 11.0]
+
+    # Six hours: 360 minutes are too many, 6 hours fit
+    resolution, rows = db.get_sensor_series(START, START + timedelta(hours=6) - timedelta(seconds=1), max_points=6)
+    assert resolution == 'hour' and len(rows) == 6
+
+    # One day: 1440 minutes are too many, 24 hours fit
+    resolution, rows = db.get_sensor_series(START, START + timedelta(days=1) - timedelta(seconds=1), max_points=30)
+    assert resolution == 'hour' and len(rows) == 24
+    node_id, bucket, count, t_min, t_max, t_mean, _, _, _ = rows[1]
+    assert (bucket, count, t_min, t_max, t_mean) == ('2025-06-01 01:00:00', 2, 12.0, 13.0, 12.5)
+
+    # Whole history in at most 5 points: days
+    resolution, rows = db.get_sensor_series(max_points=5)
+    assert resolution == 'day'
+    assert [(row[1], row[2], row[5]) for row in rows] == [
+        ('2025-06-01 00:00:00', 48, 11.5), ('2025-06-02 00:00:00', 48, 11.5), ('2025-06-03 00:00:00', 48, 11.5)
+    ]
@@ -0,0 +1,22 @@
+import os
+
+from config import Config
+from node_cache import NodeDataCache
+
+
+def test_node_cache_reads_last_line(no_newline_csv, keyring, monkeypatch):
+    monkeypatch.setattr(Config, 'TAIL_SETTLE_SECONDS', 0)
+    cache = NodeDataCache('data', keyring)
+    (node_ids, temperatures, humidities, timestamps, _), _, _ = cache.read_new_classified({})
+    assert len(node_ids) == 4
+    assert (node_ids[-1], temperatures[-1], humidities[-1]) == (3, 45.0, 62.3)
+
+
+def test_node_cache_reads_last_line_on_next_refresh(no_newline_csv, keyring, monkeypatch):
+    monkeypatch.setattr(Config, 'TAIL_SETTLE_SECONDS', 3600)
+    cache = NodeDataCache('data', keyring)
+    assert len(cache.node_series()[3][0]) == 1
+    # The file did not grow since: its last line is complete
+    assert cache.refresh() == [os.path.join('data', 'no_trailing_newline.csv')]
+    timestamps, temperatures, humidities = cache.node_series()[3]
+    assert list(temperatures) == [24.8, 45.0]
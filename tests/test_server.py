@@ -0,0 +1,90 @@
+import pytest
+
+
+@pytest.mark.parametrize('field', ['temperature', 'humidity'])
+@pytest.mark.parametrize('value', ['nan', 'inf', '-Infinity'])
+def test_non_finite_reading_is_rejected(client, field, value):
+    reading = {"node_id": 40, "temperature": 21.0, "humidity": 50.0, field: value}
+    response = client.post('/api/sensor_data', json=reading)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_non_finite_reading_is_rejected_in_batch(client):
+    response = client.post('/api/sensor_data/batch', json=[
+        {"node_id": 41, "temperature": 21.0, "humidity": 50.0},
+        {"node_id": 41, "temperature": "nan", "humidity": 50.0},
+    ])
+    body = response.get_json()
+    assert (body["accepted"], body["rejected"]) == (1, 1)
+    assert body["results"][1]["status"] == "error"
+
+
+def test_non_finite_arduino_reading_is_rejected(client):
+    assert client.get('/api/send_data?node_id=42&temp=nan&hum=50').status_code == 400
+
+
+def test_date_only_until_covers_the_whole_day(client):
+    for timestamp in ('2025-03-01 00:00:00', '2025-03-01 23:59:59', '2025-03-02 00:00:00'):
+        reading = {"node_id": 50, "temperature": 21.0, "humidity": 50.0, "timestamp": timestamp}
+        assert client.post('/api/sensor_data', json=reading).status_code == 200
+
+    body = client.get('/api/get_data?node_id=50&until=2025-03-01').get_json()
+    assert [row["timestamp"] for row in body["data"]["50"]] == ['2025-03-01 00:00:00', '2025-03-01 23:59:59']
+    body = client.get('/api/get_data?node_id=50&since=2025-03-02').get_json()
+    assert [row["timestamp"] for row in body["data"]["50"]] == ['2025-03-02 00:00:00']
+
+
+def node_alerts(client, node_id):
+    return client.get(f'/api/get_alerts?node_id={node_id}').get_json()["alerts"]
+
+
+def test_incident_of_deleted_alert_reports_a_new_alert(client):
+    hot = {"node_id": 60, "temperature": 60.0, "humidity": 50.0, "timestamp": "2025-04-01 10:00:00"}
+    assert client.post('/api/sensor_data', json=hot).status_code == 200
+    (alert,) = node_alerts(client, 60)
+    assert client.post('/api/delete_alerts', json={"ids": [alert["id"]]}).get_json()["deleted"] == 1
+
+    hot["timestamp"] = "2025-04-01 10:00:05"
+    assert client.post('/api/sensor_data', json=hot).status_code == 200
+    (alert,) = node_alerts(client, 60)
+    assert alert["timestamp"] == "2025-04-01 10:00:05"
+
+
+@pytest.mark.parametrize('body', ['null', 'not json', '[1]', '{}', '{"alert_id": [1]}', '{"alert_id": "x"}'])
+def test_mark_alert_read_rejects_bad_body(client, body):
+    response = client.post('/api/mark_alert_read', data=body, content_type='application/json')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('node_id', [-1, 2 ** 32])
+def test_node_id_outside_uint32_is_rejected(client, node_id):
+    reading = {"node_id": node_id, "temperature": 21.0, "humidity": 50.0}
+    assert client.post('/api/sensor_data', json=reading).status_code == 400
+    assert client.get(f'/api/get_data?node_id={node_id}&format=packed').status_code == 400
+
+
+def test_packed_readings(client):
+    reading = {"node_id": 70, "temperature": 21.5, "humidity": 50.0, "timestamp": "2025-05-01 00:00:00"}
+    assert client.post('/api/sensor_data', json=reading).status_code == 200
+    response = client.get('/api/get_data?node_id=70&format=packed')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.forest.packed'
+    assert response.data.startswith(b'FPK\x01')
+
+
+def test_node_buffer_read_and_read_columns_agree(server_module):
+    buffer = server_module.NodeBuffer(4)
+    for seq in range(1, 7):  # Wraps around: seqs 3..6 remain
+        buffer.append(seq, f"2025-01-01 00:00:0{seq}", 20.0 + seq, 50.0)
+
+    readings, last_seq, more = buffer.read(after_seq=3, until="2025-01-01 00:00:05", limit=1, with_seq=True)
+    assert readings == [{"timestamp": "2025-01-01 00:00:04", "temperature": 24.0, "humidity": 50.0, "seq": 4}]
+    assert (last_seq, more) == (4, True)
+    assert buffer.read_columns(after_seq=3, until="2025-01-01 00:00:05", limit=1) == (
+        ["2025-01-01 00:00:04"], [24.0], [50.0], 4, True
+    )
+
+    readings, last_seq, more = buffer.read(after_seq=4, since="2025-01-01 00:00:06")
+    assert [reading["timestamp"] for reading in readings] == ["2025-01-01 00:00:06"]
+    assert buffer.read_columns(after_seq=4, since="2025-01-01 00:00:06")[3:] == (last_seq, more) == (6, False)
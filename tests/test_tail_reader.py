@@ -0,0 +1,40 @@
+import os
+
+from config import Config
+from csv_manager import CSVManager
+from database import Database
+from tail_reader import TailReader
+
+LAST_ROW = (3, '2023-06-15 08:10:00', 45.0, 62.3)
+
+
+def test_final_read_returns_last_line_without_newline(no_newline_csv, keyring):
+    reader = TailReader(keyring=keyring)
+    records = [record for batch in reader.iter_batches(no_newline_csv, final=True) for record in batch]
+    assert len(records) == 4
+    assert records[-1] == LAST_ROW
+
+
+def test_last_line_waits_while_file_is_being_written(no_newline_csv, keyring, monkeypatch):
+    monkeypatch.setattr(Config, 'TAIL_SETTLE_SECONDS', 3600)
+    reader = TailReader(keyring=keyring)
+    assert len(list(reader.iter_records(no_newline_csv))) == 3
+    # Not grown since: the line is complete
+    assert list(reader.iter_records(no_newline_csv)) == [LAST_ROW]
+    assert list(reader.iter_records(no_newline_csv)) == []
+
+
+def test_settled_file_returns_last_line_at_once(no_newline_csv, keyring):
+    old = os.path.getmtime(no_newline_csv) - Config.TAIL_SETTLE_SECONDS - 1
+    os.utime(no_newline_csv, (old, old))
+    reader = TailReader(keyring=keyring)
+    assert list(reader.iter_records(no_newline_csv))[-1] == LAST_ROW
+
+
+def test_import_csv_imports_last_line(no_newline_csv):
+    ok, message = CSVManager().import_csv(no_newline_csv)
+    assert ok, message
+    rows = Database().get_sensor_data(limit=None)
+    assert len(rows) == 4
+    assert (3, 45.0, 62.3, '2023-06-15 08:10:00') in [tuple(row) for row in rows]
+
@@ -0,0 +1,94 @@
+import csv
+
+from config import Config
+import segments
+from write_behind import WriteBehindWriter
+
+
+class FlakyFernet:
+    """Fails encrypting the fail_at-th token (counted across calls), or every token when fail_at is None"""
+    def __init__(self, fernet, fail_at=None):
+        self.fernet = fernet
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def encrypt(self, data):
+        self.calls += 1
+        if self.fail_at in (None, self.calls):
+            raise OSError("disk full")
+        return self.fernet.encrypt(data)
+
+
+class FlakyKeyRing:
+    def __init__(self, fernet):
+        self._fernet = fernet
+
+    def fernet(self):
+        return self._fernet
+
+
+def readings(count):
+    return [{"temperature": 20.0 + index, "humidity": 50.0, "timestamp": f"2025-01-01 00:00:{index:02d}"}
+            for index in range(count)]
+
+
+def test_failed_csv_write_is_not_duplicated_by_retry(workdir, keyring):
+    writer = WriteBehindWriter('data', FlakyKeyRing(FlakyFernet(keyring.fernet(), fail_at=2)),
+                               storage_format='csv')
+    pending = {1: readings(3)}
+    writer._flush(pending)
+    assert writer.error_count == 1 and pending
+    writer._flush(pending)
+    writer._close_handles()
+
+    with open(writer.data_file(1), newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['node_id', 'data_encrypted', 'timestamp']
+    assert [row[2] for row in rows[1:]] == [reading["timestamp"] for reading in readings(3)]
+
+
+def test_readings_are_dropped_after_max_attempts(workdir, keyring, monkeypatch):
+    monkeypatch.setattr(Config, 'WRITER_MAX_ATTEMPTS', 2)
+    writer = WriteBehindWriter('data', FlakyKeyRing(FlakyFernet(keyring.fernet())), storage_format='csv')
+    pending = {1: readings(3)}
+    writer.pending_rows = 3
+    writer._flush(pending)
+    assert pending
+    writer._flush(pending)
+    assert not pending
+    assert (writer.pending_rows, writer.dropped_rows, writer.rows_written) == (0, 3, 0)
+
+
+def test_failed_segment_write_keeps_file_framed(workdir, keyring, monkeypatch):
+    writer = WriteBehindWriter('data', keyring, storage_format='segment')
+    writer._flush({1: readings(2)})
+    append_segment = segments.append_segment
+
+    def half_written(handle, fernet, records):
+        handle.write(segments.encode_segment(fernet, records)[:20])
+        raise OSError("disk full")
+
+    monkeypatch.setattr(segments, 'append_segment', half_written)
+    pending = {1: readings(3)}
+    writer._flush(pending)
+    assert pending
+    monkeypatch.setattr(segments, 'append_segment', append_segment)
+    writer._flush(pending)
+    writer._close_handles()
+
+    records = list(segments.iter_records(writer.data_file(1), keyring.fernet()))
+    assert [record[1] for record in records] == [reading["timestamp"] for reading in readings(2) + readings(3)]
+
+
+def test_incomplete_segment_left_by_a_crash_is_dropped(workdir, keyring):
+    path = WriteBehindWriter('data', keyring, storage_format='segment').data_file(1)
+    with open(path, 'wb') as f:
+        segments.append_segment(f, keyring.fernet(), [(1, '2025-01-01 00:00:00', 20.0, 50.0)])
+        f.write(segments.encode_segment(keyring.fernet(), [(1, '2025-01-01 00:00:01', 21.0, 50.0)])[:30])
+
+    writer = WriteBehindWriter('data', keyring, storage_format='segment')
+    writer._flush({1: readings(1)})
+    writer._close_handles()
+
+    records = list(segments.iter_records(path, keyring.fernet()))
+    assert [record[1] for record in records] == ['2025-01-01 00:00:00', '2025-01-01 00:00:00']
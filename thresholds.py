@@ -0,0 +1,107 @@
+"""Vectorised threshold classification shared by the server, database and client.
+
+Readings are classified a whole batch at a time from columnar arrays of
+temperature and humidity, using the thresholds defined in Config. Each metric
+gets one condition code per reading; helpers turn the codes into alert tuples
+or table status labels.
+"""
+import numpy as np
+from config import Config
+
+# Condition codes, one per reading and metric
+NORMAL = 0
+LOW = 1
+HIGH = 2
+CRITICAL_LOW = 3
+CRITICAL_HIGH = 4
+CODE_COUNT = 5
+
+# Alert severity per condition code
+SEVERITIES = np.array(['', 'high', 'high', 'critical', 'critical'], dtype=object)
+
+TEMPERATURE_LABELS = {
+    LOW: "Low temperature",
+    HIGH: "High temperature",
+    CRITICAL_LOW: "Critical low temperature",
+    CRITICAL_HIGH: "Critical high temperature",
+}
+HUMIDITY_LABELS = {
+    LOW: "Low humidity",
+    HIGH: "High humidity",
+    CRITICAL_LOW: "Critical low humidity",
+    CRITICAL_HIGH: "Critical high humidity",
+}
+TEMPERATURE_MESSAGES = {code: label + " ({value}°C)" for code, label in TEMPERATURE_LABELS.items()}
+HUMIDITY_MESSAGES = {code: label + " ({value}%)" for code, label in HUMIDITY_LABELS.items()}
+
+TEMPERATURE_STATUS = ['', 'LOW TEMP', 'HIGH TEMP', 'CRITICAL LOW TEMP', 'CRITICAL HIGH TEMP']
+HUMIDITY_STATUS = ['', 'LOW HUMIDITY', 'HIGH HUMIDITY', 'CRITICAL LOW HUMIDITY', 'CRITICAL HIGH HUMIDITY']
+
+# Status text for every (temperature code, humidity code) pair, indexed by
+# temperature_code * CODE_COUNT + humidity_code
+STATUS_TABLE = np.array([
+    ", ".join(label for label in (TEMPERATURE_STATUS[t], HUMIDITY_STATUS[h]) if label) or "Normal"
+    for t in range(CODE_COUNT)
+    for h in range(CODE_COUNT)
+], dtype=object)
+
+
+def classify_temperature(temperatures, margin=0.0):
+    """Condition codes for an array of temperatures (°C).
+
+    A positive margin moves every threshold that far towards the normal range,
+    which gives the release side of a hysteresis band.
+    """
+    values = np.asarray(temperatures, dtype=float)
+    codes = np.zeros(values.shape, dtype=np.int8)
+    codes[values <= Config.TEMP_LOW_THRESHOLD + margin] = LOW
+    codes[values >= Config.TEMP_HIGH_THRESHOLD - margin] = HIGH
+    codes[values >= Config.TEMP_CRITICAL_THRESHOLD - margin] = CRITICAL_HIGH
+    return codes
+
+
+def classify_humidity(humidities, margin=0.0):
+    """Condition codes for an array of relative humidities (%), margin as for temperatures"""
+    values = np.asarray(humidities, dtype=float)
+    codes = np.zeros(values.shape, dtype=np.int8)
+    codes[values <= Config.HUMIDITY_LOW_THRESHOLD + margin] = LOW
+    codes[values <= Config.HUMIDITY_CRITICAL_THRESHOLD + margin] = CRITICAL_LOW
+    codes[values >= Config.HUMIDITY_HIGH_THRESHOLD - margin] = HIGH
+    return codes
+
+
+def classify(temperatures, humidities, temperature_margin=0.0, humidity_margin=0.0):
+    """Classify a batch of readings, returns (temperature_codes, humidity_codes)"""
+    return classify_temperature(temperatures, temperature_margin), classify_humidity(humidities, humidity_margin)
+
+
+def alerts_for(node_ids, temperatures, humidities, timestamps):
+    """Build (node_id, message, severity, timestamp, metric) alerts for a batch of readings.
+
+    Alerts come out in reading order, temperature before humidity, and only the
+    readings that crossed a threshold are visited in Python. metric is
+    'temperature' or 'humidity'; with node_id, timestamp and severity it
+    identifies the alert.
+    """
+    temperature_values = np.asarray(temperatures, dtype=float)
+    humidity_values = np.asarray(humidities, dtype=float)
+    temperature_codes, humidity_codes = classify(temperature_values, humidity_values)
+
+    alerts = []
+    for index in np.flatnonzero(temperature_codes | humidity_codes).tolist():
+        node_id = node_ids[index]
+        timestamp = timestamps[index]
+        for metric, code, value, messages in (
+            ('temperature', temperature_codes[index], temperature_values[index], TEMPERATURE_MESSAGES),
+            ('humidity', humidity_codes[index], humidity_values[index], HUMIDITY_MESSAGES),
+        ):
+            if code != NORMAL:
+                message = messages[code].format(value=float(value))
+                alerts.append((node_id, f"Node {node_id}: {message}", SEVERITIES[code], timestamp, metric))
+    return alerts
+
+
+def status_labels(temperature_codes, humidity_codes):
+    """Status text per reading for table display ("Normal" when within thresholds)"""
+    keys = np.asarray(temperature_codes, dtype=np.intp) * CODE_COUNT + np.asarray(humidity_codes, dtype=np.intp)
+    return STATUS_TABLE[keys]
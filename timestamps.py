@@ -0,0 +1,20 @@
+"""Reading timestamp parsing shared by the alert engine, charts, wire format and decryptor.
+
+Timestamps are 'YYYY-MM-DD HH:MM:SS' strings; they are parsed a whole batch
+at a time into numpy datetime64 values at second resolution.
+"""
+import numpy as np
+
+
+def to_datetime64(timestamps):
+    """Vectorised timestamp parsing, unparseable values become NaT"""
+    try:
+        return np.array(timestamps, dtype='datetime64[s]')
+    except ValueError:
+        parsed = []
+        for timestamp in timestamps:
+            try:
+                parsed.append(np.datetime64(timestamp, 's'))
+            except ValueError:
+                parsed.append(np.datetime64('NaT'))
+        return np.array(parsed, dtype='datetime64[s]')
@@ -0,0 +1,60 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+
+class BackgroundWorker:
+    """Run blocking work (HTTP, files, database) on a thread pool for a Tk app.
+
+    Results are queued by the pool threads and delivered on the Tk thread by
+    a poll loop scheduled with root.after, so callbacks may touch widgets and
+    application state freely. Tk itself is never called from a pool thread.
+    """
+    def __init__(self, root, max_workers=None, poll_ms=None):
+        self.root = root
+        self.poll_ms = poll_ms or Config.WORKER_POLL_MS
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or Config.WORKER_THREADS,
+                                           thread_name_prefix="ui-worker")
+        self.results = queue.Queue()
+        self.running = set()  # Keys of keyed jobs in flight
+        self.root.after(self.poll_ms, self.poll)
+
+    def submit(self, func, *args, on_done=None, on_error=None, key=None):
+        """Run func(*args) in the background, then on_done(result) or on_error(exception) on the Tk thread.
+
+        A job with a key is skipped (returns False) while another job with the
+        same key is still running, so periodic refreshes never pile up behind
+        a slow server.
+        """
+        if key is not None:
+            if key in self.running:
+                return False
+            self.running.add(key)
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda done: self.results.put((key, done, on_done, on_error)))
+        return True
+
+    def poll(self):
+        """Deliver finished jobs to their callbacks (Tk thread)"""
+        while True:
+            try:
+                key, future, on_done, on_error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.running.discard(key)
+            try:
+                error = future.exception()
+                if error is None:
+                    if on_done is not None:
+                        on_done(future.result())
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    print(f"Background task failed: {error}")
+            except Exception as e:
+                print(f"Error handling background result: {e}")
+        self.root.after(self.poll_ms, self.poll)
+
+    def shutdown(self):
+        """Stop accepting work; jobs already running finish on their own"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
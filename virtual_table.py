@@ -0,0 +1,136 @@
+"""Virtual Treeview for large reading tables.
+
+Rows live in a ColumnStore (one array per column, append-only). The
+VirtualTable widget keeps only as many Treeview items as fit on screen and
+rewrites their values when it scrolls, so the cost of a refresh depends on
+the window height, not on the number of rows.
+"""
+import tkinter as tk
+from tkinter import ttk
+from array import array
+
+import thresholds
+
+
+class ColumnStore:
+    """Append-only reading columns with their threshold status"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.node_ids = []
+        self.temperatures = array('d')
+        self.humidities = array('d')
+        self.timestamps = []
+        self.statuses = []
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def extend(self, node_ids, temperatures, humidities, timestamps, statuses=None):
+        """Append rows given as columns, classifying only the new readings unless statuses are given"""
+        if not timestamps:
+            return
+        if statuses is None:
+            statuses = thresholds.status_labels(*thresholds.classify(temperatures, humidities))
+        self.statuses.extend(statuses)
+        self.node_ids.extend(node_ids)
+        self.temperatures.extend(temperatures)
+        self.humidities.extend(humidities)
+        self.timestamps.extend(timestamps)
+
+    def row(self, index):
+        return (self.node_ids[index], self.temperatures[index], self.humidities[index],
+                self.timestamps[index], self.statuses[index])
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview materialising only the visible rows of a ColumnStore.
+
+    Scroll position and selection are tracked as store indices, so they
+    survive refresh() when rows are appended.
+    """
+    def __init__(self, master, store, columns, tags_for=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.store = store
+        self.tags_for = tags_for or (lambda row: ())
+        self.offset = 0            # Store index of the first visible row
+        self.visible_rows = 1
+        self.selected = set()      # Selected store indices
+
+        self.tree = ttk.Treeview(self, columns=[name for name, _, _ in columns],
+                                 show='headings', selectmode='extended')
+        for name, heading, options in columns:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, **options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda event: self.scroll(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda event: self.scroll(1, 'units'))
+        self.tree.bind('<Prior>', lambda event: self.scroll(-1, 'pages'))
+        self.tree.bind('<Next>', lambda event: self.scroll(1, 'pages'))
+
+    def row_height(self):
+        return int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+
+    def on_resize(self, event):
+        # Keep the heading row out of the count
+        rows = max(1, event.height // self.row_height() - 1)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+
+    def yview(self, *args):
+        """Scrollbar command: 'moveto fraction' or 'scroll n units|pages'"""
+        if args[0] == 'moveto':
+            self.set_offset(int(float(args[1]) * len(self.store)))
+        elif args[0] == 'scroll':
+            self.scroll(int(args[1]), args[2])
+
+    def scroll(self, amount, what):
+        step = self.visible_rows if what == 'pages' else 1
+        self.set_offset(self.offset + amount * step)
+        return 'break'
+
+    def set_offset(self, offset):
+        offset = max(0, min(offset, len(self.store) - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def on_select(self, event=None):
+        window = range(self.offset, self.offset + self.visible_rows)
+        self.selected.difference_update(window)
+        self.selected.update(self.offset + int(iid) for iid in self.tree.selection())
+
+    def selected_rows(self):
+        """Selected rows, in store order"""
+        return [self.store.row(index) for index in sorted(self.selected) if index < len(self.store)]
+
+    def refresh(self):
+        """Redraw the visible window, e.g. after rows were appended to the store"""
+        self.offset = max(0, min(self.offset, len(self.store) - self.visible_rows))
+        end = min(len(self.store), self.offset + self.visible_rows)
+        count = end - self.offset
+
+        for position in range(count):
+            row = self.store.row(self.offset + position)
+            iid = str(position)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=row, tags=self.tags_for(row))
+            else:
+                self.tree.insert('', tk.END, iid=iid, values=row, tags=self.tags_for(row))
+        for iid in self.tree.get_children()[count:]:
+            self.tree.delete(iid)
+
+        self.tree.selection_set([str(index - self.offset) for index in self.selected if self.offset <= index < end])
+        if len(self.store):
+            self.scrollbar.set(self.offset / len(self.store), end / len(self.store))
+        else:
+            self.scrollbar.set(0, 1)
@@ -0,0 +1,111 @@
+"""Response encodings of the read API (/api/get_data, /api/get_alerts).
+
+Clients pick one with the Accept header or a ?format= parameter:
+
+    json      application/json                      row objects (default)
+    columnar  application/vnd.forest.columnar+json  one array per field
+    msgpack   application/x-msgpack                 columnar layout as MessagePack
+                                                    (needs the optional msgpack package)
+    packed    application/vnd.forest.packed         raw little-endian arrays (readings only)
+
+The columnar layouts send timestamps as integer seconds since 1970-01-01 in
+the readings' own clock (they carry no time zone), null when unparseable.
+A packed body is MAGIC followed, per node, by
+
+    node_id (uint32) | count (uint32) | count x timestamp (int64, NAT_SECONDS if unparseable) |
+    count x temperature (float32) | count x humidity (float32)
+
+and carries next_cursor/has_more in the X-Next-Cursor and X-Has-More headers.
+"""
+import json
+import struct
+
+import numpy as np
+
+from timestamps import to_datetime64
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+JSON = 'application/json'
+COLUMNAR = 'application/vnd.forest.columnar+json'
+MSGPACK = 'application/x-msgpack'
+PACKED = 'application/vnd.forest.packed'
+
+MIMETYPES = {'json': JSON, 'columnar': COLUMNAR, 'msgpack': MSGPACK, 'packed': PACKED}
+FORMATS = {mimetype: name for name, mimetype in MIMETYPES.items()}
+
+MAGIC = b'FPK\x01'
+NAT_SECONDS = np.iinfo(np.int64).min
+_NODE_HEADER = struct.Struct('<II')
+
+
+class UnsupportedFormat(ValueError):
+    """Raised when a requested encoding is unknown or unavailable on this server"""
+
+
+def negotiate(request, formats=('json', 'columnar', 'msgpack', 'packed')):
+    """Response format for a Flask request: ?format= wins over the Accept header, JSON by default"""
+    requested = request.args.get('format')
+    if requested:
+        if requested not in formats:
+            raise UnsupportedFormat(f"format must be one of: {', '.join(formats)}")
+    else:
+        requested = FORMATS.get(request.accept_mimetypes.best_match([MIMETYPES[name] for name in formats]), 'json')
+    if requested == 'msgpack' and msgpack is None:
+        raise UnsupportedFormat("MessagePack is not available on this server")
+    return requested
+
+
+def epoch_seconds(timestamps):
+    """Timestamp strings as int64 seconds since the epoch (NAT_SECONDS where unparseable)"""
+    return to_datetime64(list(timestamps)).astype(np.int64)
+
+
+def _seconds_list(seconds):
+    return [None if value == NAT_SECONDS else value for value in seconds.tolist()]
+
+
+def encode_readings(name, nodes, next_cursor, has_more):
+    """Encode {node_id: (timestamps, temperatures, humidities)} columns, returns (body, headers)"""
+    if name == 'packed':
+        parts = [MAGIC]
+        for node_id, (timestamps, temperatures, humidities) in nodes.items():
+            parts.append(_NODE_HEADER.pack(node_id, len(timestamps)))
+            parts.append(epoch_seconds(timestamps).astype('<i8').tobytes())
+            parts.append(np.asarray(temperatures, dtype='<f4').tobytes())
+            parts.append(np.asarray(humidities, dtype='<f4').tobytes())
+        headers = {'X-Next-Cursor': next_cursor, 'X-Has-More': json.dumps(has_more)}
+        return b''.join(parts), headers
+
+    document = {
+        "status": "success",
+        "data": {
+            str(node_id): {
+                "timestamp": _seconds_list(epoch_seconds(timestamps)),
+                "temperature": list(temperatures),
+                "humidity": list(humidities)
+            }
+            for node_id, (timestamps, temperatures, humidities) in nodes.items()
+        },
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    }
+    return _dump(name, document), {}
+
+
+def encode_alerts(name, alerts):
+    """Encode alert dicts in the columnar layout (JSON or MessagePack), returns the body"""
+    fields = ('id', 'seq', 'node_id', 'message', 'severity', 'timestamp', 'read')
+    columns = {field: [alert[field] for alert in alerts] for field in fields}
+    columns['timestamp'] = _seconds_list(epoch_seconds(columns['timestamp']))
+    return _dump(name, {"status": "success", "alerts": columns})
+
+
+def _dump(name, document):
+    if name == 'msgpack':
+        return msgpack.packb(document, use_bin_type=True)
+    return json.dumps(document, separators=(',', ':'))
+
@@ -0,0 +1,262 @@
+import csv
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+import segments
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """Background writer appending encrypted readings to the per-node data files.
+
+    Request threads only enqueue readings. A single writer thread encrypts
+    them, keeps one open handle per node file and writes in groups, when
+    flush_size readings are pending or flush_interval seconds after the
+    first one arrived, whichever comes first.
+
+    With storage_format 'segment' each group becomes one encrypted segment
+    (see segments.py); with 'csv' every reading is a 'data_encrypted' row.
+    Encryption uses the key-ring's current primary key at each flush, so a
+    key rotation takes effect without restarting the writer.
+
+    A failed write is truncated away before the node's readings are retried,
+    so a retry never appends after a partial row or segment; readings still
+    failing after WRITER_MAX_ATTEMPTS flushes are dropped, keeping the
+    pending rows bounded.
+    """
+    def __init__(self, data_dir, keyring, flush_size=None, flush_interval=None, queue_size=None,
+                 storage_format=None):
+        self.data_dir = data_dir
+        self.keyring = keyring
+        self.storage_format = storage_format or Config.STORAGE_FORMAT
+        self.flush_size = flush_size or Config.WRITER_FLUSH_SIZE
+        self.flush_interval = flush_interval or Config.WRITER_FLUSH_INTERVAL
+        self.queue = queue.Queue(maxsize=queue_size or Config.WRITER_QUEUE_SIZE)
+        self.handles = {}  # node_id -> open file
+        self.truncations = {}  # node_id -> size to cut the file back to before writing again
+        self.attempts = {}  # node_id -> consecutive failed flushes
+        self.io_lock = threading.Lock()  # Held while writing, see exclusive()
+        self.thread = None
+        self.closed = False
+
+        # Statistics, updated by the writer thread only
+        self.pending_rows = 0
+        self.rows_written = 0
+        self.flush_count = 0
+        self.error_count = 0
+        self.dropped_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self):
+        """Start the writer thread"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self.thread.start()
+
+    def submit(self, node_id, readings):
+        """Queue readings of one node for writing.
+
+        Blocks up to Config.WRITER_SUBMIT_TIMEOUT when the queue is full and
+        then raises queue.Full, so ingest slows down instead of using unbounded memory.
+        """
+        if self.closed:
+            raise RuntimeError("Writer is closed")
+        self.queue.put((node_id, list(readings)), timeout=Config.WRITER_SUBMIT_TIMEOUT)
+
+    def flush(self, timeout=None):
+        """Write everything queued so far, returns False on timeout"""
+        done = threading.Event()
+        self.queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Flush pending readings, stop the thread and close file handles"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+
+    @contextmanager
+    def exclusive(self, path=None):
+        """Pause writing and release the open file handles.
+
+        Used by key rotation to replace data files while the server runs;
+        readings keep queuing meanwhile and are written to the new file.
+        """
+        with self.io_lock:
+            self._close_handles()
+            for node_id in list(self.truncations):
+                try:
+                    self._truncate(node_id)
+                except OSError as e:
+                    print(f"Write-behind error for node {node_id}: {e}")
+            yield
+
+    def stats(self):
+        """Queue depth and flush latency figures for monitoring"""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "pending_rows": self.pending_rows,
+            "rows_written": self.rows_written,
+            "flush_count": self.flush_count,
+            "error_count": self.error_count,
+            "dropped_rows": self.dropped_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0
+        }
+
+    def _run(self):
+        pending = {}
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(pending)
+                with self.io_lock:
+                    self._close_handles()
+                return
+            if isinstance(item, threading.Event):
+                self._flush(pending)
+                deadline = None
+                item.set()
+                continue
+            if item is not None:
+                node_id, readings = item
+                pending.setdefault(node_id, []).extend(readings)
+                self.pending_rows += len(readings)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if pending and (self.pending_rows >= self.flush_size or time.monotonic() >= deadline):
+                self._flush(pending)
+                deadline = time.monotonic() + self.flush_interval if pending else None
+
+    def data_file(self, node_id):
+        """Path of a node's data file for the configured storage format"""
+        extension = segments.SEGMENT_EXTENSION if self.storage_format == 'segment' else '.csv'
+        return os.path.join(self.data_dir, f"node_{node_id}_data{extension}")
+
+    def _handle(self, node_id):
+        handle = self.handles.get(node_id)
+        if handle is None:
+            filepath = self.data_file(node_id)
+            if self.storage_format == 'segment':
+                self._drop_partial_segment(filepath)
+                handle = open(filepath, 'ab')
+            else:
+                new_file = not os.path.isfile(filepath) or os.path.getsize(filepath) == 0
+                handle = open(filepath, 'a', newline='')
+                if new_file:
+                    csv.writer(handle).writerow(['node_id', 'data_encrypted', 'timestamp'])
+            self.handles[node_id] = handle
+        return handle
+
+    @staticmethod
+    def _drop_partial_segment(filepath):
+        """Cut a segment left incomplete (e.g. by a crash) so new segments stay framed"""
+        if not os.path.isfile(filepath):
+            return
+        with open(filepath, 'rb') as f:
+            length = segments.complete_length(f)
+            size = f.seek(0, os.SEEK_END)
+        if length < size:
+            print(f"Dropping {size - length} bytes of an incomplete segment at the end of {filepath}")
+            os.truncate(filepath, length)
+
+    def _truncate(self, node_id):
+        """Cut a node file back to its size before a failed write"""
+        try:
+            os.truncate(self.data_file(node_id), self.truncations[node_id])
+        except FileNotFoundError:
+            pass  # Removed meanwhile, nothing to cut
+        del self.truncations[node_id]
+
+    def _write(self, node_id, readings, fernet):
+        if node_id in self.truncations:
+            self._truncate(node_id)
+        handle = self._handle(node_id)
+        start = handle.tell()
+        try:
+            self._write_readings(handle, node_id, readings, fernet)
+        except Exception:
+            # Drop the buffered bytes, then whatever reached the file
+            self._close_handle(node_id)
+            self.truncations[node_id] = start
+            try:
+                self._truncate(node_id)
+            except OSError:
+                pass  # Retried before the next write
+            raise
+
+    def _write_readings(self, handle, node_id, readings, fernet):
+        if self.storage_format == 'segment':
+            # 🔐 One encrypted block for the whole group
+            segments.append_segment(handle, fernet, [
+                (node_id, reading['timestamp'], reading['temperature'], reading['humidity'])
+                for reading in readings
+            ])
+        else:
+            # 🔐 Chiffrer les données avant sauvegarde CSV
+            csv.writer(handle).writerows(
+                [node_id, fernet.encrypt(f"{reading['temperature']},{reading['humidity']}".encode()).decode(), reading['timestamp']]
+                for reading in readings
+            )
+        handle.flush()
+
+    def _flush(self, pending):
+        """Write pending readings; failed nodes stay pending for up to WRITER_MAX_ATTEMPTS flushes"""
+        if not pending:
+            return
+        started = time.perf_counter()
+        fernet = self.keyring.fernet()
+        with self.io_lock:
+            for node_id in list(pending):
+                readings = pending[node_id]
+                try:
+                    self._write(node_id, readings, fernet)
+                except Exception as e:
+                    self.error_count += 1
+                    attempts = self.attempts[node_id] = self.attempts.get(node_id, 0) + 1
+                    if attempts < Config.WRITER_MAX_ATTEMPTS:
+                        print(f"Write-behind error for node {node_id}: {e}")
+                        continue
+                    print(f"Write-behind error for node {node_id}, dropping {len(readings)} readings "
+                          f"after {attempts} attempts: {e}")
+                    self.dropped_rows += len(readings)
+                else:
+                    self.rows_written += len(readings)
+                self.attempts.pop(node_id, None)
+                del pending[node_id]
+                self.pending_rows -= len(readings)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    def _close_handle(self, node_id):
+        handle = self.handles.pop(node_id, None)
+        if handle is not None:
+            try:
+                handle.close()
+            except OSError:
+                pass
+
+    def _close_handles(self):
+        for node_id in list(self.handles):
+            self._close_handle(node_id)